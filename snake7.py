@@ -9,43 +9,96 @@ Iteration 7: Fill in the event handlers in the controller (the class Snake) by c
 with the view (the class SnakeView) and the model (the class SnakeModel)
 """
 
+import argparse
+import os
 import random
 import time
 import tkinter as tk
-import unittest
+
+from snake_autopilot import AUTOPILOTS
+from snake_camera import Camera
+from snake_metrics import TickMetrics
+from snake_model import InputQueue, SnakeModel
+from snake_replay import ReplayRecorder
+from snake_scheduler import POLICIES, TickScheduler
 
 
 class Snake:
     """This is the controller"""
 
-    def __init__(self):
-        """Initializes the snake game"""
+    def __init__(
+        self,
+        view_class=None,
+        replay_dir=None,
+        autopilot=None,
+        tick_policy="skip",
+        latency_path=None,
+        num_rows=30,
+        num_cols=30,
+        view_rows=30,
+        view_cols=30,
+    ):
+        """Initializes the snake game on a num_rows by num_cols grid, drawing the
+        view_rows by view_cols cells around the snake head with view_class which
+        defaults to SnakeView, saving a replay of every finished game in replay_dir,
+        letting autopilot steer the snake instead of the arrow keys if given,
+        handling late steps with the tick_policy of the scheduler, and writing the
+        step latencies to latency_path on quit if given"""
         # Define parameters
-        self.NUM_ROWS = 30
-        self.NUM_COLS = 30
+        self.NUM_ROWS = num_rows
+        self.NUM_COLS = num_cols
         self.DEFAULT_STEP_TIME_MILLIS = 1000
+        # Share of the step time an autopilot with a time budget may search
+        self.AUTOPILOT_TIME_FRACTION = 0.5
+        # Seconds between refreshes of the latency panel, which takes longer to format
+        # than a step of the model
+        self.STATUS_SECONDS = 0.25
+        self.CELL_COLORS = {
+            "head": "Black",
+            "body": "Blue",
+            "open": "White",
+            "food": "Red",
+        }
 
         # Initialize game state
         self.is_running = False
 
-        # Create model
-        self.model = SnakeModel(self.NUM_ROWS, self.NUM_COLS)
-
-        # Create view
-        self.view = SnakeView(self.NUM_ROWS, self.NUM_COLS)
+        # Create model, seeded so that the game can be replayed
+        self.seed = random.getrandbits(64)
+        self.model = SnakeModel(self.NUM_ROWS, self.NUM_COLS, random.Random(self.seed))
+
+        # Set up the autopilot, or else queue the turns of the player
+        self.autopilot = autopilot
+        self.inputs = InputQueue()
+
+        # Set up replay recording
+        self.replay_dir = replay_dir
+        self.recorder = None
+        self.start_recording()
+
+        # Create view of the window of the grid that the camera shows, remembering
+        # the color of each of its cells
+        self.camera = Camera(self.NUM_ROWS, self.NUM_COLS, view_rows, view_cols)
+        if view_class is None:
+            view_class = SnakeView
+        self.view = view_class(self.camera.view_rows, self.camera.view_cols)
+        self.view_colors = [
+            [None] * self.camera.view_cols for _ in range(self.camera.view_rows)
+        ]
 
         # Set up step time
         self.step_time_millis = self.DEFAULT_STEP_TIME_MILLIS
+        self.set_autopilot_time_budget()
+        self.scheduler = TickScheduler(self.step_time_millis / 1000, tick_policy)
 
-        # Initialize snake head
-        self.view.set_initial_snake_head(
-            self.model.snake_body[0][0], self.model.snake_body[0][1]
-        )
+        # Set up step latency histograms
+        self.metrics = TickMetrics()
+        self.latency_path = latency_path
+        self.status_time = 0.0
 
-        # Initialize food
-        self.view.set_initial_food(
-            self.model.current_food_location[0], self.model.current_food_location[1]
-        )
+        # Draw the snake head and food
+        self.camera.follow(*self.model.snake_body[0])
+        self.draw_view()
 
         # Set up the control
 
@@ -84,44 +137,52 @@ class Snake:
         if not self.is_running:
             self.is_running = True
             if self.model.elapsed_time == 0:
-                self.model.start_time = time.time()
-                self.view.schedule_next_step(
-                    self.step_time_millis, self.continue_simulation
-                )
+                self.model.start_time = self.model.clock.time()
             else:
-                self.model.resumed_time = time.time()
+                self.model.resumed_time = self.model.clock.time()
                 time_paused = self.model.resumed_time - self.model.paused_time
                 self.model.time_spent_paused += time_paused
-                self.view.schedule_next_step(
-                    self.step_time_millis, self.continue_simulation
-                )
+            self.scheduler.start()
+            self.view.schedule_next_step(
+                self.scheduler.delay(), self.continue_simulation
+            )
 
     def pause_handler(self):
         """Pause simulation"""
         if self.is_running:
             self.view.cancel_next_step()
+            self.scheduler.stop()
             self.is_running = False
-            self.model.paused_time = time.time()
+            self.model.paused_time = self.model.clock.time()
 
     def step_speed_handler(self, value):
         """Adjust simulation speed"""
         self.step_time_millis = self.DEFAULT_STEP_TIME_MILLIS // int(value)
+        self.scheduler.set_interval(self.step_time_millis / 1000)
+        self.set_autopilot_time_budget()
+
+    def set_autopilot_time_budget(self):
+        """Let an autopilot that searches within a time budget use part of a step"""
+        if hasattr(self.autopilot, "time_budget"):
+            self.autopilot.time_budget = (
+                self.AUTOPILOT_TIME_FRACTION * self.step_time_millis / 1000
+            )
 
     def change_north(self, event):
-        """Change direction north"""
-        self.model.direction = "North"
+        """Queue a turn north"""
+        self.inputs.push("North")
 
     def change_south(self, event):
-        """Change direction south"""
-        self.model.direction = "South"
+        """Queue a turn south"""
+        self.inputs.push("South")
 
     def change_east(self, event):
-        """Change direction east"""
-        self.model.direction = "East"
+        """Queue a turn east"""
+        self.inputs.push("East")
 
     def change_west(self, event):
-        """Change direction west"""
-        self.model.direction = "West"
+        """Queue a turn west"""
+        self.inputs.push("West")
 
     def reset_handler(self):
         """Reset simulation"""
@@ -130,6 +191,11 @@ class Snake:
 
     def quit_handler(self):
         """Quit life program"""
+        print(self.scheduler.report())
+        if self.latency_path is not None:
+            self.metrics.write(self.latency_path)
+        if self.autopilot is not None:
+            print(self.autopilot.latency_report())
         self.view.window.destroy()
 
     def wrap_around_handler(self):
@@ -143,46 +209,117 @@ class Snake:
 
     def reset(self):
         """Resets both the view and the model of the game"""
-        self.model.reset()
-        self.view.set_initial_snake_head(
-            self.model.snake_body[0][0], self.model.snake_body[0][1]
-        )
-        for i in self.model.open_cells:
-            self.view.cells[i[0]][i[1]]["bg"] = "White"
-        self.view.set_initial_food(
-            self.model.current_food_location[0], self.model.current_food_location[1]
-        )
+        self.seed = random.getrandbits(64)
+        self.model.reset(self.seed)
+        self.inputs.clear()
+        self.start_recording()
+        self.camera.follow(*self.model.snake_body[0])
+        self.draw_view()
         self.view.one_step(self.model.points, self.model.elapsed_time, 0.00)
         self.view.game_over_text.set(" ")
 
-    def continue_simulation(self):
-        """Perform another step of the simulation, and schedule the next step."""
-        self.one_step()
-        if self.model.state == "running":
-            self.view.schedule_next_step(
-                self.step_time_millis, self.continue_simulation
+    def paint_cell(self, row, col, kind):
+        """Paints the cell in row and column of the grid with the color of kind, if
+        the camera shows it and it is not that color already"""
+        cell = self.camera.to_view(row, col)
+        if cell is not None:
+            view_row, view_col = cell
+            color = self.CELL_COLORS[kind]
+            if self.view_colors[view_row][view_col] != color:
+                self.view_colors[view_row][view_col] = color
+                self.view.set_cell_color(view_row, view_col, color)
+
+    def draw_view(self):
+        """Paints each cell the camera shows whose color changed, which looks up
+        every visible cell but no others"""
+        occupancy = self.model.occupancy
+        head = self.model.snake_body[0]
+        food = self.model.current_food_location
+        colors = self.CELL_COLORS
+        cols = self.camera.visible_cols()
+        for view_row, row in enumerate(self.camera.visible_rows()):
+            view_colors = self.view_colors[view_row]
+            row_start = row * self.NUM_COLS
+            for view_col, col in enumerate(cols):
+                if occupancy[row_start + col]:
+                    kind = "head" if (row, col) == head else "body"
+                elif (row, col) == food:
+                    kind = "food"
+                else:
+                    kind = "open"
+                if view_colors[view_col] != colors[kind]:
+                    view_colors[view_col] = colors[kind]
+                    self.view.set_cell_color(view_row, view_col, colors[kind])
+
+    def start_recording(self):
+        """Starts recording the directions of the current game, if saving replays"""
+        if self.replay_dir is not None:
+            self.recorder = ReplayRecorder(
+                self.NUM_ROWS, self.NUM_COLS, self.seed, self.model.wrap_status
             )
 
+    def save_replay(self):
+        """Saves the replay of the finished game to the replay directory"""
+        if self.recorder is not None:
+            os.makedirs(self.replay_dir, exist_ok=True)
+            path = os.path.join(self.replay_dir, f"{self.seed}.replay")
+            self.recorder.save(path, self.model.points)
+            self.recorder = None
+
+    def continue_simulation(self):
+        """Perform the steps that are due, and schedule a wake up at the deadline of
+        the next one, so that the time spent on these steps does not delay it"""
+        ticks = self.scheduler.due()
+        if ticks:
+            self.metrics.add("lateness", self.scheduler.lateness)
+        for _ in range(ticks):
+            self.one_step()
+            if self.model.state != "running":
+                self.scheduler.stop()
+                return
+        self.view.schedule_next_step(self.scheduler.delay(), self.continue_simulation)
+
     def one_step(self):
         """Moves the snake based follwing the rules of the model and accordingly updates the view"""
-        if self.model.one_step() == "running":
-            for i in self.model.snake_body:
-                self.view.cells[i[0]][i[1]]["bg"] = "Blue"
-            self.view.cells[self.model.snake_body[0][0]][self.model.snake_body[0][1]][
-                "bg"
-            ] = "Black"
-            for i in self.model.open_cells:
-                self.view.cells[i[0]][i[1]]["bg"] = "White"
-            self.view.cells[self.model.current_food_location[0]][
-                self.model.current_food_location[1]
-            ]["bg"] = "Red"
+        turn = None
+        if self.autopilot is not None:
+            self.model.direction = self.autopilot(self.model)
+        else:
+            turn = self.inputs.pop_turn(self.model)
+            if turn is not None:
+                self.model.direction = turn[0]
+        if self.recorder is not None:
+            self.recorder.record(self.model.direction, self.model.wrap_status)
+        start = time.perf_counter()
+        state = self.model.one_step()
+        rendering = time.perf_counter()
+        self.metrics.add("model", rendering - start)
+        if state == "running":
+            # Redraw the window if the camera moved, and otherwise only repaint the
+            # cells that changed in this step
+            if self.camera.follow(*self.model.snake_body[0]):
+                self.draw_view()
+            else:
+                for (row, col), kind in self.model.changed_cells:
+                    self.paint_cell(row, col, kind)
             self.view.one_step(
                 self.model.points,
                 self.model.elapsed_time,
                 self.model.points / self.model.elapsed_time,
             )
+            rendered = time.perf_counter()
+            self.metrics.add("render", rendered - rendering)
+            if turn is not None:
+                self.metrics.add("input", rendered - turn[1])
+            if rendered - self.status_time >= self.STATUS_SECONDS:
+                self.view.latency_var.set(self.metrics.status())
+                self.status_time = rendered
+        elif self.model.state == "game won":
+            self.view.game_over_text.set("You Win")
+            self.save_replay()
         else:
             self.view.game_over_text.set("Game Over")
+            self.save_replay()
 
 
 class SnakeView:
@@ -191,9 +328,10 @@ class SnakeView:
     def __init__(self, num_rows, num_cols):
         """Initialize view of the game"""
         # Constants
-        self.CELL_SIZE = 20
+        self.CELL_SIZE = self.cell_size(num_rows, num_cols)
         self.CONTROL_FRAME_HEIGHT = 100
         self.SCORE_FRAME_WIDTH = 200
+        self.MIN_SCORE_FRAME_HEIGHT = 300
         self.game_over_text = " "
 
         # Size of grid
@@ -238,7 +376,7 @@ class SnakeView:
         self.score_frame = tk.Frame(
             self.window,
             width=self.SCORE_FRAME_WIDTH,
-            height=num_rows * self.CELL_SIZE,
+            height=max(num_rows * self.CELL_SIZE, self.MIN_SCORE_FRAME_HEIGHT),
             borderwidth=1,
             relief="solid",
         )
@@ -252,6 +390,7 @@ class SnakeView:
             self.time_label,
             self.points_per_sec_frame,
             self.points_per_sec_label,
+            self.latency_label,
             self.game_over_label,
         ) = self.add_score()
 
@@ -261,6 +400,10 @@ class SnakeView:
         self.time_var.set(f"Time: {time:.2f}")
         self.points_per_sec_var.set(f"Points Per Sec: {points_per_sec:.2f}")
 
+    def cell_size(self, num_rows, num_cols):
+        """Returns the width and height of a cell in pixels"""
+        return 20
+
     def add_cells(self):
         """Add cells to the grid frame"""
         cells = []
@@ -352,10 +495,17 @@ class SnakeView:
         )
         points_per_sec_label.grid(row=1, column=1)
 
+        self.latency_var = tk.StringVar()
+        self.latency_var.set(" ")
+        latency_label = tk.Label(
+            self.score_frame, textvariable=self.latency_var, justify="left"
+        )
+        latency_label.grid(row=5, column=1)
+
         self.game_over_text = tk.StringVar()
         self.game_over_text.set(" ")
         game_over_label = tk.Label(self.score_frame, textvariable=self.game_over_text)
-        game_over_label.grid(row=5, column=1)
+        game_over_label.grid(row=6, column=1)
 
         # Horizontally center the widgets in the score frame
         self.score_frame.grid_columnconfigure(1, weight=1)
@@ -366,6 +516,7 @@ class SnakeView:
         self.score_frame.grid_rowconfigure(3, weight=1)
         self.score_frame.grid_rowconfigure(4, weight=1)
         self.score_frame.grid_rowconfigure(5, weight=1)
+        self.score_frame.grid_rowconfigure(6, weight=1)
 
         return (
             score_label,
@@ -375,16 +526,21 @@ class SnakeView:
             time_label,
             points_per_sec_frame,
             points_per_sec_label,
+            latency_label,
             game_over_label,
         )
 
+    def set_cell_color(self, row, col, color):
+        """Make cell in row and column the given color"""
+        self.cells[row][col]["bg"] = color
+
     def set_initial_snake_head(self, row, col):
         """Make cell in row and column represent the snake head"""
-        self.cells[row][col]["bg"] = "black"
+        self.set_cell_color(row, col, "black")
 
     def set_initial_food(self, row, col):
         """Make cell in row and column represent the food"""
-        self.cells[row][col]["bg"] = "red"
+        self.set_cell_color(row, col, "red")
 
     def set_start_handler(self, handler):
         """set handler for clicking on start button to the function handler"""
@@ -435,284 +591,217 @@ class SnakeView:
         self.window.after_cancel(self.start_timer_object)
 
 
-class SnakeModel:
-    """This is the model"""
-
-    def __init__(self, num_rows, num_cols):
-        """initialize the model of the game"""
-
-        # Size of grid
-        self.num_rows = num_rows
-        self.num_cols = num_cols
-
-        # Initialize open cells which is a list containg tuple elements
-        # Each tuple elemet specifies the row and column of each open cell on the grid
-        self.open_cells = [
-            (r, c) for r in range(self.num_rows) for c in range(self.num_cols)
-        ]
-
-        # Initialize snake body
-        self.snake_body = []
-        self.snake_body.append(random.choice(self.open_cells))
-        self.open_cells.remove(self.snake_body[0])
-        self.snake_tail = self.snake_body[0]
-
-        # Initialize food
-        self.current_food_location = random.choice(self.open_cells)
-
-        # Initialize distance from walls
-        self.distance_list = []
-        distance_from_east = abs((self.num_cols - 1) - self.snake_body[0][1])
-        distance_from_west = abs(0 - self.snake_body[0][1])
-        distance_from_north = abs(0 - self.snake_body[0][0])
-        distance_from_south = abs((self.num_rows - 1) - self.snake_body[0][0])
-        self.distance_list = [
-            distance_from_east,
-            distance_from_west,
-            distance_from_north,
-            distance_from_south,
-        ]
-
-        # Initialize direction
-        self.direction = self.check_direction()
-
-        # Inialize points
-        self.points = 0
-
-        # Initialize time
-        self.start_time = 0
-        self.elapsed_time = 0
-        self.paused_time = 0
-        self.time_spent_paused = 0
-        self.unpaused_time = 0
-        self.resumed_time = 0
+class CanvasSnakeView(SnakeView):
+    """View that draws the grid of cells as rectangles on a single canvas instead of
+    one frame widget per cell"""
 
-        # Initialize wrap around mode status
-        self.wrap_status = False
-
-        # Initialize game status
-        self.state = "running"
+    def add_cells(self):
+        """Add a canvas to the grid frame, and a rectangle item for each cell"""
+        self.canvas = tk.Canvas(
+            self.grid_frame,
+            width=self.num_cols * self.CELL_SIZE,
+            height=self.num_rows * self.CELL_SIZE,
+            borderwidth=0,
+            highlightthickness=0,
+        )
+        self.canvas.grid(row=0, column=0)  # use grid layout manager
+        cells = []
+        for r in range(self.num_rows):
+            row = []
+            for c in range(self.num_cols):
+                x = c * self.CELL_SIZE
+                y = r * self.CELL_SIZE
+                rectangle = self.canvas.create_rectangle(
+                    x, y, x + self.CELL_SIZE - 1, y + self.CELL_SIZE - 1
+                )
+                row.append(rectangle)
+            cells.append(row)
+        return cells
 
-    def one_step(self):
-        """simulates one time step to move the snake"""
-        if self.paused_time == 0:
-            self.elapsed_time = time.time() - self.start_time
-        else:
-            self.elapsed_time = (time.time() - self.start_time) - self.time_spent_paused
-        self.check_game_over()
-        if self.state == "running":
-            self.move_snake()
-            self.check_food()
-        return self.state
-
-    def move_snake(self):
-        """moves the snake in a given direction North, South, West or East"""
-        if self.direction == "North":
-            self.update_body()
-            if self.wrap_status:
-                self.wrap()
-            else:
-                self.snake_body[0] = (self.snake_body[0][0] - 1, self.snake_body[0][1])
-        elif self.direction == "South":
-            self.update_body()
-            if self.wrap_status:
-                self.wrap()
-            else:
-                self.snake_body[0] = (self.snake_body[0][0] + 1, self.snake_body[0][1])
-        elif self.direction == "West":
-            self.update_body()
-            if self.wrap_status:
-                self.wrap()
-            else:
-                self.snake_body[0] = (self.snake_body[0][0], self.snake_body[0][1] - 1)
-        else:  # direction == East
-            self.update_body()
-            if self.wrap_status:
-                self.wrap()
-            else:
-                self.snake_body[0] = (self.snake_body[0][0], self.snake_body[0][1] + 1)
-
-    def update_body(self):
-        """adjusts the the snake body to follow the snake head"""
-        if len(self.snake_body) > 2:
-            self.snake_tail = self.snake_body[-1]
-            for i in range(len(self.snake_body) - 1, 0, -1):
-                self.snake_body[i] = self.snake_body[i - 1]
-        elif len(self.snake_body) > 1:
-            self.snake_tail = self.snake_body[-1]
-            self.snake_body[1] = self.snake_body[0]
-        else:
-            self.snake_tail = self.snake_body[-1]
-
-    def check_distance(self):
-        """checks distance from each border direction"""
-        self.distance_list = []
-        distance_from_east = abs((self.num_cols - 1) - self.snake_body[0][1])
-        distance_from_west = abs(0 - self.snake_body[0][1])
-        distance_from_north = abs(0 - self.snake_body[0][0])
-        distance_from_south = abs((self.num_rows - 1) - self.snake_body[0][0])
-        self.distance_list = [
-            distance_from_east,
-            distance_from_west,
-            distance_from_north,
-            distance_from_south,
-        ]
+    def set_cell_color(self, row, col, color):
+        """Make cell in row and column the given color"""
+        self.canvas.itemconfigure(self.cells[row][col], fill=color)
 
-    def check_game_over(self):
-        """checks if the user makes the game terminate"""
-        # check if snake head hits a boundary
-        if self.wrap_status == False:
-            self.check_distance()
-            if self.distance_list[0] == 0 and self.direction == "East":
-                self.state = "game over"
-            elif self.distance_list[1] == 0 and self.direction == "West":
-                self.state = "game over"
-            elif self.distance_list[2] == 0 and self.direction == "North":
-                self.state = "game over"
-            elif self.distance_list[3] == 0 and self.direction == "South":
-                self.state = "game over"
-            else:
-                pass
-
-        # check if snake head hits snake body
-        for i in range(1, len(self.snake_body)):
-            if self.snake_body[0][1] == self.snake_body[i][1]:
-                if self.direction == "North":
-                    if self.snake_body[0][0] - 1 == self.snake_body[i][0]:
-                        self.state = "game over"
-                if self.direction == "South":
-                    if self.snake_body[0][0] + 1 == self.snake_body[i][0]:
-                        self.state = "game over"
-            if self.snake_body[0][0] == self.snake_body[i][0]:
-                if self.direction == "West":
-                    if self.snake_body[0][1] - 1 == self.snake_body[i][1]:
-                        self.state = "game over"
-                if self.direction == "East":
-                    if self.snake_body[0][1] + 1 == self.snake_body[i][1]:
-                        self.state = "game_over"
-
-    def check_food(self):
-        """checks if the snake eats the food"""
-        if self.snake_body[0] == self.current_food_location:
-            self.snake_body.append(self.snake_tail)
-            self.points += 1
-            self.check_open_cells()
-            self.current_food_location = random.choice(self.open_cells)
-        else:
-            self.check_open_cells()
 
-    def check_open_cells(self):
-        """checks which cells are open"""
-        self.open_cells = [
-            (r, c) for r in range(self.num_rows) for c in range(self.num_cols)
-        ]
-        for i in self.snake_body:
-            self.open_cells.remove(i)
-
-    def wrap(self):
-        """handles wrapping the snake head around to the other side of grid relative to the boundary
-        that the snake head currently touches and its current direction"""
-        self.check_distance()
-        if self.direction == "East":
-            if self.distance_list[0] == 0:
-                self.snake_body[0] = (self.snake_body[0][0], 0)
-            else:
-                self.snake_body[0] = (self.snake_body[0][0], self.snake_body[0][1] + 1)
-        elif self.direction == "West":
-            if self.distance_list[1] == 0:
-                self.snake_body[0] = (self.snake_body[0][0], self.num_cols - 1)
-            else:
-                self.snake_body[0] = (self.snake_body[0][0], self.snake_body[0][1] - 1)
-        elif self.direction == "North":
-            if self.distance_list[2] == 0:
-                self.snake_body[0] = (self.num_rows - 1, self.snake_body[0][1])
-            else:
-                self.snake_body[0] = (self.snake_body[0][0] - 1, self.snake_body[0][1])
-        else:
-            if self.distance_list[3] == 0:
-                self.snake_body[0] = (0, self.snake_body[0][1])
-            else:
-                self.snake_body[0] = (self.snake_body[0][0] + 1, self.snake_body[0][1])
-
-    def check_direction(self):
-        """helper function that returns the furthest direction that the snake head is away from"""
-        self.check_distance()
-        direction = max(self.distance_list)
-        if direction == self.distance_list[0]:
-            direction = "East"
-        elif direction == self.distance_list[1]:
-            direction = "West"
-        elif direction == self.distance_list[2]:
-            direction = "North"
-        else:
-            direction = "South"
-        return direction
+class PhotoSnakeView(SnakeView):
+    """View that draws the grid into PhotoImage tiles at 1 to 4 pixels per cell, for
+    grids with too many cells for a widget or canvas item each
 
-    def reset(self):
-        """resets the game to its original state genreating the snake head, food,
-        and the remaining open cells"""
-        self.snake_body = []
-        self.open_cells = [
-            (r, c) for r in range(self.num_rows) for c in range(self.num_cols)
-        ]
-        self.snake_body.append(random.choice(self.open_cells))
-        self.check_open_cells()
-        self.current_food_location = random.choice(self.open_cells)
-        self.direction = self.check_direction()
-        self.elapsed_time = 0.00
-        self.points = 0
-        self.time_spent_paused = 0
-        self.paused_time = 0
-        self.state = "running"
-
-
-class SnakeModelTest(unittest.TestCase):
-    def set_up(self):
-        self.model = SnakeModel(5, 5)
-        self.model.open_cells = [
-            (0, 0),
-            (0, 1),
-            (0, 2),
-            (0, 3),
-            (0, 4),
-            (1, 0),
-            (1, 1),
-            (1, 2),
-            (1, 3),
-            (1, 4),
-            (2, 0),
-            (2, 1),
-            (2, 2),
-            (2, 3),
-            (2, 4),
-            (3, 0),
-            (3, 1),
-            (3, 2),
-            (3, 3),
-            (3, 4),
-            (4, 0),
-            (4, 1),
-            (4, 2),
-            (4, 3),
-            (4, 4),
-        ]
+    Painting a cell only records it. When Tk is next idle, each tile with painted
+    cells gets one put covering the bounding box of those cells, unless the box has
+    more than MAX_BOX_CELLS cells for each painted one, in which case each run of
+    painted cells next to each other in a row gets a put of its own. The other tiles
+    are not sent to Tk at all."""
 
-        self.model.snake_body.append(self.model.open_cells[2])
-        self.model.current_food_location = self.model.open_cells[7]
-        self.correct_direction = "South"
-        self.correct_tail_location = (0, 2)
-        self.correct_snake_length = 2
-        self.correct_game_over_state = "game over"
+    def __init__(self, num_rows, num_cols):
+        """Initialize view of the game"""
+        self.TILE_CELLS = 64
+        self.MAX_GRID_PIXELS = 1024
+        self.MAX_BOX_CELLS = 4
+        super().__init__(num_rows, num_cols)
 
-    def test_initial_direction(self):
-        self.assertEqual(self.model.check_direction, self.correct_direction)
+    def cell_size(self, num_rows, num_cols):
+        """Returns the most pixels per cell, up to 4, that fit the grid in
+        MAX_GRID_PIXELS"""
+        return max(1, min(4, self.MAX_GRID_PIXELS // max(num_rows, num_cols)))
 
-    def test_one_step(self):
-        self.model.one_step()
-        self.assertEqual(self.model.snake_body[1], self.correct_tail_location)
-        self.asssetEqual(len(self.model.snake_body), self.correct_snake_length)
-        self.assertEqual(self.model.state, self.correct_game_over_state)
+    def add_cells(self):
+        """Add a canvas to the grid frame, and a white PhotoImage for each tile"""
+        self.canvas = tk.Canvas(
+            self.grid_frame,
+            width=self.num_cols * self.CELL_SIZE,
+            height=self.num_rows * self.CELL_SIZE,
+            borderwidth=0,
+            highlightthickness=0,
+        )
+        self.canvas.grid(row=0, column=0)  # use grid layout manager
+        self.hex_colors = {}
+        self.pixel_runs = {}
+        white = self.hex_color("White")
+        self.cell_colors = [[white] * self.num_cols for _ in range(self.num_rows)]
+        self.dirty_tiles = {}
+        self.flush_scheduled = False
+        self.tile_puts = 0
+
+        self.tiles = {}
+        for tile_row in range(0, self.num_rows, self.TILE_CELLS):
+            for tile_col in range(0, self.num_cols, self.TILE_CELLS):
+                width = min(self.TILE_CELLS, self.num_cols - tile_col) * self.CELL_SIZE
+                height = min(self.TILE_CELLS, self.num_rows - tile_row) * self.CELL_SIZE
+                image = tk.PhotoImage(width=width, height=height)
+                image.put(white, to=(0, 0, width, height))
+                self.canvas.create_image(
+                    tile_col * self.CELL_SIZE,
+                    tile_row * self.CELL_SIZE,
+                    image=image,
+                    anchor="nw",
+                )
+                tile = (tile_row // self.TILE_CELLS, tile_col // self.TILE_CELLS)
+                self.tiles[tile] = image
+        return self.tiles
+
+    def hex_color(self, color):
+        """Returns color as #rrggbb, which is how PhotoImage data names colors"""
+        hex_color = self.hex_colors.get(color)
+        if hex_color is None:
+            red, green, blue = self.window.winfo_rgb(color)
+            hex_color = f"#{red >> 8:02x}{green >> 8:02x}{blue >> 8:02x}"
+            self.hex_colors[color] = hex_color
+            # One cell wide run of pixels of the color, for the rows of a put
+            self.pixel_runs[hex_color] = " ".join([hex_color] * self.CELL_SIZE)
+        return hex_color
+
+    def set_cell_color(self, row, col, color):
+        """Make cell in row and column the given color, the next time Tk is idle"""
+        color = self.hex_color(color)
+        if self.cell_colors[row][col] == color:
+            return
+        self.cell_colors[row][col] = color
+        tile = (row // self.TILE_CELLS, col // self.TILE_CELLS)
+        cells = self.dirty_tiles.get(tile)
+        if cells is None:
+            cells = self.dirty_tiles[tile] = set()
+        cells.add((row, col))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.window.after_idle(self.flush)
+
+    def flush(self):
+        """Write the painted cells of each tile with one put for their bounding box,
+        or one put per run of them if the box is mostly cells that did not change"""
+        for tile, cells in self.dirty_tiles.items():
+            rows = [row for row, col in cells]
+            cols = [col for row, col in cells]
+            top, left, bottom, right = min(rows), min(cols), max(rows), max(cols)
+            box_cells = (bottom - top + 1) * (right - left + 1)
+            if box_cells <= self.MAX_BOX_CELLS * len(cells):
+                self.put_cells(tile, top, left, bottom, right)
+                continue
+            run = None
+            for row, col in sorted(cells):
+                if run is not None and row == run[0] and col == run[2] + 1:
+                    run[2] = col
+                    continue
+                if run is not None:
+                    self.put_cells(tile, run[0], run[1], run[0], run[2])
+                run = [row, col, col]
+            self.put_cells(tile, run[0], run[1], run[0], run[2])
+        self.dirty_tiles.clear()
+        self.flush_scheduled = False
+
+    def put_cells(self, tile, top, left, bottom, right):
+        """Write the cells from top to bottom and left to right into tile, in one put"""
+        size = self.CELL_SIZE
+        runs = self.pixel_runs
+        data = []
+        for row in range(top, bottom + 1):
+            colors = self.cell_colors[row][left : right + 1]
+            pixel_row = "{" + " ".join([runs[color] for color in colors]) + "}"
+            data.extend([pixel_row] * size)
+        self.tiles[tile].put(
+            " ".join(data),
+            to=(
+                (left - tile[1] * self.TILE_CELLS) * size,
+                (top - tile[0] * self.TILE_CELLS) * size,
+            ),
+        )
+        self.tile_puts += 1
 
 
 if __name__ == "__main__":
-    snake_game = Snake()
+    parser = argparse.ArgumentParser(description="Greedy snake")
+    parser.add_argument(
+        "--canvas",
+        action="store_true",
+        help="draw the grid on a single canvas instead of one frame per cell",
+    )
+    parser.add_argument(
+        "--photo",
+        action="store_true",
+        help="draw the grid as image tiles at 1 to 4 pixels per cell, for large grids",
+    )
+    parser.add_argument(
+        "--record", metavar="DIR", help="save a replay of every finished game in DIR"
+    )
+    parser.add_argument(
+        "--autopilot", choices=sorted(AUTOPILOTS), help="let an autopilot steer"
+    )
+    parser.add_argument(
+        "--tick-policy",
+        choices=POLICIES,
+        default="skip",
+        help="skip the steps missed when running late, or catch up on them",
+    )
+    parser.add_argument(
+        "--latency-out",
+        metavar="FILE",
+        help="write step latency percentiles on quit, as JSON if FILE ends in .json"
+        " and as CSV otherwise",
+    )
+    parser.add_argument("--rows", type=int, default=30, help="rows of the grid")
+    parser.add_argument("--cols", type=int, default=30, help="columns of the grid")
+    parser.add_argument(
+        "--view-rows", type=int, default=30, help="rows shown around the snake head"
+    )
+    parser.add_argument(
+        "--view-cols", type=int, default=30, help="columns shown around the snake head"
+    )
+    args = parser.parse_args()
+    autopilot = None
+    if args.autopilot:
+        autopilot = AUTOPILOTS[args.autopilot]()
+        try:
+            autopilot.check_grid(args.rows, args.cols)
+        except ValueError as error:
+            parser.error(str(error))
+    snake_game = Snake(
+        PhotoSnakeView if args.photo else CanvasSnakeView if args.canvas else SnakeView,
+        args.record,
+        autopilot,
+        args.tick_policy,
+        args.latency_out,
+        args.rows,
+        args.cols,
+        args.view_rows,
+        args.view_cols,
+    )
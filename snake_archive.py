@@ -0,0 +1,214 @@
+"""
+Module: snake_archive
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Single-file archive of snake replays with random access
+
+Packs many replays from snake_replay into one file, followed by an index of where
+each one starts, and reads it back through mmap. A reader can jump straight to game
+k and step t without parsing the games before it, and gets memoryview and NumPy
+views of the direction codes without copying them. The layout, in little-endian
+order, is
+
+    magic         4 bytes, b"SNKA"
+    version       4 bytes
+    num_games     8 bytes
+    index_offset  8 bytes
+    replays       one after another, as written by snake_replay
+    index         8 bytes of offset and 8 bytes of size for each replay
+
+    python snake_archive.py pack games.snka replays/*.replay
+    python snake_archive.py verify games.snka
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import unittest
+
+from snake_headless import POLICIES
+from snake_model import DIRECTION_CODES
+from snake_replay import Replay, record_episode, replay
+
+MAGIC = b"SNKA"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")
+INDEX_ENTRY = struct.Struct("<QQ")
+
+
+def write_archive(path, replays):
+    """Writes the replays, an iterable of replay bytes, to an archive at path and
+    returns the number of replays written"""
+    index = []
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER.size))
+        offset = HEADER.size
+        for data in replays:
+            f.write(data)
+            index.append((offset, len(data)))
+            offset += len(data)
+        for entry in index:
+            f.write(INDEX_ENTRY.pack(*entry))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(index), offset))
+    return len(index)
+
+
+class ReplayArchive:
+    """Memory-mapped archive of replays, indexed by game"""
+
+    def __init__(self, path):
+        """open the archive at path"""
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.map)
+        magic, version, self.num_games, self.index_offset = HEADER.unpack_from(
+            self.buffer
+        )
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("not a snake replay archive")
+
+    def __len__(self):
+        """number of games in the archive"""
+        return self.num_games
+
+    def __getitem__(self, game):
+        """returns the Replay of game, backed by the mapped file"""
+        if game < 0:
+            game += self.num_games
+        if not 0 <= game < self.num_games:
+            raise IndexError("game out of range")
+        offset, size = INDEX_ENTRY.unpack_from(
+            self.buffer, self.index_offset + game * INDEX_ENTRY.size
+        )
+        return Replay(self.buffer[offset : offset + size])
+
+    def __iter__(self):
+        """iterates over the replays in the archive"""
+        for game in range(self.num_games):
+            yield self[game]
+
+    def direction(self, game, step):
+        """returns the direction of step in game"""
+        return self[game].direction(step)
+
+    def packed_directions(self, game):
+        """returns a NumPy uint8 view of the packed direction codes of game, four steps
+        to a byte, without copying them"""
+        import numpy as np
+
+        return np.frombuffer(self[game].directions, dtype=np.uint8)
+
+    def direction_codes(self, game):
+        """returns a NumPy array with the direction code of every step of game"""
+        import numpy as np
+
+        data = self[game]
+        packed = np.frombuffer(data.directions, dtype=np.uint8)
+        codes = (packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3
+        return codes.reshape(-1)[: data.num_steps]
+
+    def state_at(self, game, step):
+        """returns the SnakeModel of game after its first step steps"""
+        return replay(self[game], step)
+
+    def close(self):
+        """closes the archive, which needs every Replay taken from it to be gone"""
+        self.buffer.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack and read snake replay archives")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack_parser = commands.add_parser("pack", help="pack replay files into an archive")
+    pack_parser.add_argument("archive")
+    pack_parser.add_argument("files", nargs="+")
+    verify_parser = commands.add_parser("verify", help="re-simulate every game")
+    verify_parser.add_argument("archive")
+    show_parser = commands.add_parser("show", help="show a game at a step")
+    show_parser.add_argument("archive")
+    show_parser.add_argument("game", type=int)
+    show_parser.add_argument("step", type=int)
+    args = parser.parse_args()
+
+    if args.command == "pack":
+
+        def read(path):
+            with open(path, "rb") as f:
+                return f.read()
+
+        count = write_archive(args.archive, (read(path) for path in args.files))
+        print(f"Packed {count} replays into {args.archive}")
+        return
+
+    with ReplayArchive(args.archive) as archive:
+        if args.command == "show":
+            model = archive.state_at(args.game, args.step)
+            print(f"Direction: {archive.direction(args.game, args.step)}")
+            print(f"Snake: {list(model.snake_body)}")
+            print(f"Food: {model.current_food_location}")
+            print(f"Points: {model.points}, state: {model.state}")
+            return
+
+        failures = 0
+        start = time.perf_counter()
+        for game in range(len(archive)):
+            data = archive[game]
+            if replay(data).points != data.points:
+                failures += 1
+                print(f"Mismatch: game {game}")
+            del data
+        seconds = time.perf_counter() - start
+        print(f"Replays: {len(archive)}, mismatches: {failures}")
+        print(f"Replays per hour: {len(archive) / seconds * 3600:.0f}")
+    sys.exit(1 if failures else 0)
+
+
+class ReplayArchiveTest(unittest.TestCase):
+    def test_random_access(self):
+        games = [
+            record_episode(6, 6, POLICIES["random"](seed=seed), seed, 300)
+            for seed in range(10)
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.snka")
+            self.assertEqual(write_archive(path, games), 10)
+            with ReplayArchive(path) as archive:
+                self.assertEqual(len(archive), 10)
+                steps = random.Random(0)
+                for game in (7, 2, 9, 0):
+                    expected = Replay(games[game])
+                    step = steps.randrange(expected.num_steps)
+                    self.assertEqual(
+                        archive.direction(game, step), expected.direction(step)
+                    )
+                    model = archive.state_at(game, step)
+                    replayed = replay(games[game], step)
+                    self.assertEqual(list(model.snake_body), list(replayed.snake_body))
+                    codes = [int(code) for code in archive.direction_codes(game)]
+                    self.assertEqual(
+                        codes,
+                        [
+                            DIRECTION_CODES.index(expected.direction(i))
+                            for i in range(expected.num_steps)
+                        ],
+                    )
+
+
+if __name__ == "__main__":
+    main()
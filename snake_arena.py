@@ -0,0 +1,247 @@
+"""
+Module: snake_arena
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Many snakes and many pieces of food on one shared grid
+
+SnakeArena moves every living snake once per step, all at the same time, with
+the rules of SnakeModel: a snake dies if its head leaves the grid or moves into
+a cell taken by any body, its own or another's, including a tail that is about to
+move. Two or more heads moving into the same cell all die. The occupancy grid is
+shared by all snakes, so a collision costs one lookup whatever the bodies' lengths,
+and heads meeting in a cell are found with one dictionary of target cells per
+step. A step therefore costs time in proportion to the number of snakes, plus the
+length of the bodies of the snakes that die in it, which are cleared off the grid.
+
+    python snake_arena.py --snakes 10 100 1000
+"""
+
+import argparse
+import random
+import time
+import unittest
+from collections import deque
+
+from snake_model import DIRECTION_CODES, DIRECTIONS, FreeCells
+
+# Row and column offsets of one step, indexed by direction code
+CODE_STEPS = [DIRECTIONS[name] for name in DIRECTION_CODES]
+
+
+class SnakeArena:
+    """Arena of num_snakes snakes and num_food pieces of food
+
+    Cells are numbered row * num_cols + col. Each snake is numbered, and has a
+    deque of cells with its head first, a direction code, points and a flag for
+    being alive."""
+
+    def __init__(
+        self, num_rows, num_cols, num_snakes, num_food=1, rng=None, wrap=False
+    ):
+        """initialize the arena with the snakes one cell long on random open cells,
+        each heading towards the wall it is furthest from"""
+        if num_snakes + num_food > num_rows * num_cols:
+            raise ValueError("the grid is too small for the snakes and food")
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_snakes = num_snakes
+        self.rng = random if rng is None else rng
+        self.wrap_status = wrap
+        self.open_cells = FreeCells(num_rows, num_cols)
+        self.occupancy = self.open_cells.occupied
+
+        self.bodies = []
+        self.directions = []
+        for snake in range(num_snakes):
+            row, col = self.rng.choice(self.open_cells)
+            self.open_cells.remove((row, col))
+            self.bodies.append(deque([row * num_cols + col]))
+            distances = (row, num_cols - 1 - col, num_rows - 1 - row, col)
+            self.directions.append(distances.index(max(distances)))
+        self.points = [0] * num_snakes
+        self.alive = [True] * num_snakes
+        self.living = num_snakes
+        self.death_causes = [None] * num_snakes
+        self.dying = []
+
+        self.food = set()
+        for _ in range(num_food):
+            self.place_food()
+
+    def place_food(self):
+        """puts a piece of food on a random open cell without food, if there is one"""
+        if len(self.open_cells) <= len(self.food):
+            return
+        while True:
+            row, col = self.rng.choice(self.open_cells)
+            cell = row * self.num_cols + col
+            if cell not in self.food:
+                self.food.add(cell)
+                return
+
+    def target(self, snake):
+        """returns the cell the head of snake moves into in its direction, or None if
+        it would leave the grid"""
+        row, col = divmod(self.bodies[snake][0], self.num_cols)
+        row_step, col_step = CODE_STEPS[self.directions[snake]]
+        row += row_step
+        col += col_step
+        if self.wrap_status:
+            row %= self.num_rows
+            col %= self.num_cols
+        elif not (0 <= row < self.num_rows and 0 <= col < self.num_cols):
+            return None
+        return row * self.num_cols + col
+
+    def one_step(self):
+        """moves every living snake one cell, and returns the number still alive"""
+        occupancy = self.occupancy
+        movers = []
+        claims = {}
+        for snake in range(self.num_snakes):
+            if not self.alive[snake]:
+                continue
+            cell = self.target(snake)
+            if cell is None:
+                self.kill(snake, "wall")
+            elif occupancy[cell]:
+                self.kill(snake, "body")
+            elif cell in claims:
+                # Heads meeting in one cell, the first of which may already be dead
+                other = claims[cell]
+                if self.alive[other]:
+                    self.kill(other, "head")
+                self.kill(snake, "head")
+            else:
+                claims[cell] = snake
+                movers.append((snake, cell))
+
+        # Bodies of snakes that died this step are still on the grid, so no mover
+        # can be in one of their cells
+        eaten = 0
+        for snake, cell in movers:
+            if not self.alive[snake]:
+                continue
+            body = self.bodies[snake]
+            body.appendleft(cell)
+            self.open_cells.remove(divmod(cell, self.num_cols))
+            if cell in self.food:
+                self.food.remove(cell)
+                self.points[snake] += 1
+                eaten += 1
+            else:
+                self.open_cells.add(divmod(body.pop(), self.num_cols))
+
+        for snake in self.dying:
+            for cell in self.bodies[snake]:
+                self.open_cells.add(divmod(cell, self.num_cols))
+        self.dying.clear()
+
+        # Replace the food once every snake has moved, so none lands under a head
+        # that has yet to move into its cell
+        for _ in range(eaten):
+            self.place_food()
+        return self.living
+
+    def kill(self, snake, cause):
+        """marks snake dead, to be cleared off the grid at the end of the step"""
+        self.alive[snake] = False
+        self.death_causes[snake] = cause
+        self.living -= 1
+        self.dying.append(snake)
+
+    def body(self, snake):
+        """returns the (row, column) cells of the body of snake, head first"""
+        return [divmod(cell, self.num_cols) for cell in self.bodies[snake]]
+
+
+def benchmark(num_snakes, num_steps, cells_per_snake=100, seed=0):
+    """Returns the number of steps per second and microseconds per snake-step of an
+    arena with num_snakes snakes and as many pieces of food, on a square grid in wrap
+    around mode with about cells_per_snake cells for each snake, where every snake
+    turns at random but never into an occupied cell"""
+    side = max(2, round((num_snakes * cells_per_snake) ** 0.5))
+    rng = random.Random(seed)
+    arena = SnakeArena(side, side, num_snakes, num_snakes, rng, wrap=True)
+    snake_steps = 0
+    steps = 0
+    start = time.perf_counter()
+    for step in range(num_steps):
+        for snake in range(num_snakes):
+            if arena.alive[snake]:
+                # Turn left, go straight or turn right, to a free cell if possible
+                direction = arena.directions[snake]
+                turns = [(direction + turn) % 4 for turn in (-1, 0, 1)]
+                rng.shuffle(turns)
+                for turn in turns:
+                    arena.directions[snake] = turn
+                    if not arena.occupancy[arena.target(snake)]:
+                        break
+        snake_steps += arena.living
+        steps += 1
+        if not arena.one_step():
+            break
+    seconds = time.perf_counter() - start
+    return steps / seconds, seconds / snake_steps * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the snake arena")
+    parser.add_argument("--snakes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--cells-per-snake", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'snakes':>8} {'steps/sec':>10} {'us/snake-step':>14}")
+    for num_snakes in args.snakes:
+        rate, micros = benchmark(num_snakes, args.steps, args.cells_per_snake)
+        print(f"{num_snakes:>8} {rate:>10.1f} {micros:>14.2f}")
+
+
+class SnakeArenaTest(unittest.TestCase):
+    def place(self, arena, bodies, directions):
+        """Puts the snakes of arena on the given (row, column) bodies"""
+        arena.open_cells = FreeCells(arena.num_rows, arena.num_cols)
+        arena.occupancy = arena.open_cells.occupied
+        for snake, body in enumerate(bodies):
+            arena.bodies[snake] = deque(r * arena.num_cols + c for r, c in body)
+            for cell in body:
+                arena.open_cells.remove(cell)
+        arena.directions = [DIRECTION_CODES.index(name) for name in directions]
+        arena.food = set()
+
+    def test_collisions(self):
+        arena = SnakeArena(6, 6, 5, 0, random.Random(0))
+        # Snakes 0 and 1 meet head on in (0, 2), snake 2 runs into snake 3 as it
+        # moves away, and snake 4 runs into the wall
+        self.place(
+            arena,
+            [[(0, 1)], [(0, 3)], [(3, 0)], [(3, 1), (4, 1)], [(5, 5)]],
+            ["East", "West", "East", "North", "South"],
+        )
+        arena.food = {2 * 6 + 1}
+        self.assertEqual(arena.one_step(), 1)
+        self.assertEqual(arena.death_causes, ["head", "head", "body", None, "wall"])
+        # Snake 3 ate the food in (2, 1), and the dead are cleared off the grid
+        self.assertEqual(arena.body(3), [(2, 1), (3, 1), (4, 1)])
+        self.assertEqual(arena.points[3], 1)
+        self.assertEqual(arena.occupancy.count(1), 3)
+        self.assertEqual(len(arena.open_cells), 33)
+
+    def test_benchmark_runs(self):
+        arena = SnakeArena(20, 20, 30, 30, random.Random(1), wrap=True)
+        for step in range(200):
+            if not arena.one_step():
+                break
+        body_cells = sum(
+            len(arena.bodies[snake]) for snake in range(30) if arena.alive[snake]
+        )
+        self.assertEqual(arena.occupancy.count(1), body_cells)
+        self.assertEqual(len(arena.food), 30)
+        self.assertTrue(all(not arena.occupancy[cell] for cell in arena.food))
+        self.assertGreater(benchmark(100, 20)[0], 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+"""
+Module: snake_autopilot
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Policies that steer the snake on their own
+
+Each autopilot is called with a SnakeModel before a step and returns the direction
+of that step, like the policies in snake_headless, and keeps track of how long its
+decisions take.
+"""
+
+import functools
+import math
+import random
+import time
+import unittest
+from array import array
+
+from snake_model import DIRECTION_CODES, DIRECTIONS, SnakeModel, VirtualClock
+
+
+class Autopilot:
+    """Base class of the autopilots, which times every decision"""
+
+    def __init__(self, seed=None):
+        """initialize the decision timing"""
+        self.decisions = 0
+        self.decision_seconds = 0.0
+        self.max_decision_seconds = 0.0
+
+    def __call__(self, model):
+        """returns the direction of the next step, and times the decision"""
+        start = time.perf_counter()
+        direction = self.decide(model)
+        seconds = time.perf_counter() - start
+        self.decisions += 1
+        self.decision_seconds += seconds
+        if seconds > self.max_decision_seconds:
+            self.max_decision_seconds = seconds
+        return direction
+
+    def decide(self, model):
+        """returns the direction of the next step"""
+        raise NotImplementedError
+
+    def check_grid(self, num_rows, num_cols):
+        """raises ValueError if the autopilot cannot steer on a grid of num_rows by
+        num_cols cells"""
+
+    def latency_report(self):
+        """returns a line with the mean and maximum decision time"""
+        mean = self.decision_seconds / self.decisions if self.decisions else 0.0
+        return (
+            f"Decisions: {self.decisions}, mean latency: {mean * 1e6:.1f} us,"
+            f" max latency: {self.max_decision_seconds * 1e6:.1f} us"
+        )
+
+
+class BFSAutopilot(Autopilot):
+    """Autopilot that follows a shortest path to the food around the body
+
+    The breadth-first search reuses its queue and visited arrays from one decision
+    to the next. Cells are visited when visited[cell] equals the number of the
+    current search, so the arrays never need clearing."""
+
+    def __init__(self, seed=None):
+        """initialize the autopilot, whose search arrays are sized on first use"""
+        super().__init__(seed)
+        self.size = 0
+        self.search_number = 0
+        self.visited = []
+        self.first_step = []
+        self.queue = []
+
+    def decide(self, model):
+        """returns the first direction of a shortest path from the head to the food,
+        or a direction that does not end the game if the food cannot be reached"""
+        direction = None
+        if model.current_food_location is not None:
+            direction = self.search(model)
+        if direction is None:
+            direction = safe_direction(model)
+        return direction
+
+    def search(self, model):
+        """returns the direction code of the first step of a shortest path from the head
+        to the food, or None if there is no path"""
+        num_rows = model.num_rows
+        num_cols = model.num_cols
+        size = num_rows * num_cols
+        if size != self.size:
+            self.size = size
+            self.search_number = 0
+            self.visited = [0] * size
+            self.first_step = [0] * size
+            self.queue = [0] * size
+        self.search_number += 1
+        search_number = self.search_number
+        visited = self.visited
+        first_step = self.first_step
+        queue = self.queue
+        occupancy = model.occupancy
+        wrap = model.wrap_status
+
+        head_row, head_col = model.body_segments[0]
+        food_row, food_col = model.current_food_location
+        food = food_row * num_cols + food_col
+        head = head_row * num_cols + head_col
+        visited[head] = search_number
+        queue[0] = head
+        front = 0
+        back = 1
+        while front < back:
+            cell = queue[front]
+            front += 1
+            row, col = divmod(cell, num_cols)
+            for code, (row_step, col_step) in CODE_STEPS:
+                next_row = row + row_step
+                next_col = col + col_step
+                if wrap:
+                    next_row %= num_rows
+                    next_col %= num_cols
+                elif not (0 <= next_row < num_rows and 0 <= next_col < num_cols):
+                    continue
+                neighbor = next_row * num_cols + next_col
+                if visited[neighbor] == search_number or occupancy[neighbor]:
+                    continue
+                visited[neighbor] = search_number
+                first_step[neighbor] = code if cell == head else first_step[cell]
+                if neighbor == food:
+                    return DIRECTION_CODES[first_step[neighbor]]
+                queue[back] = neighbor
+                back += 1
+        return None
+
+
+class HamiltonianAutopilot(Autopilot):
+    """Autopilot that never dies, by following a cycle through every cell of the grid
+
+    Cells are numbered by their position on the cycle. The snake body always lies on
+    the stretch of the cycle from the tail forward to the head, so stepping to the next
+    cell of the cycle is always safe. The autopilot may skip ahead on the cycle towards
+    the food, as long as it stays behind the food and clear of the tail by a margin
+    that grows with the square of the snake's share of the grid. A skipped cell that
+    later gets the food costs nearly a lap of the body, so the margin leaves long
+    snakes little room to skip and they mostly follow the cycle.
+
+    Filling the grid takes about cells ** 2 / 8 steps either way, since the last
+    foods are on average half the open cells away along the cycle."""
+
+    def check_grid(self, num_rows, num_cols):
+        """raises ValueError if the grid has no cycle through every cell"""
+        hamiltonian_cycle(num_rows, num_cols)
+
+    def decide(self, model):
+        """returns the direction of the next cell of the cycle, or of a safe shortcut"""
+        num_cols = model.num_cols
+        cycle, order = hamiltonian_cycle(model.num_rows, num_cols)
+        size = len(cycle)
+        head_row, head_col = model.body_segments[0]
+        head = order[head_row * num_cols + head_col]
+        tail_row, tail_col = model.body_segments[-1]
+        # A snake of one cell has the whole cycle ahead of it
+        tail_distance = (order[tail_row * num_cols + tail_col] - head) % size or size
+        best_direction = None
+        best_distance = 1
+
+        if model.current_food_location:
+            food_row, food_col = model.current_food_location
+            food_distance = (order[food_row * num_cols + food_col] - head) % size
+            # Stay a few cells behind the tail, which stands still while the snake
+            # grows, and further behind it the longer the snake
+            length = len(model.body_segments)
+            limit = min(food_distance, tail_distance - 4 - length * length // size)
+            for direction in DIRECTION_CODES:
+                cell = model.next_head(direction)
+                if cell is None:
+                    continue
+                cell = cell[0] * num_cols + cell[1]
+                distance = (order[cell] - head) % size
+                if best_distance < distance <= limit and not model.occupancy[cell]:
+                    best_direction = direction
+                    best_distance = distance
+
+        if best_direction is None:
+            next_row, next_col = divmod(cycle[(head + 1) % size], num_cols)
+            best_direction = step_direction((head_row, head_col), (next_row, next_col))
+        return best_direction
+
+
+class MCTSAutopilot(Autopilot):
+    """Autopilot that plans with a Monte Carlo tree search within a time budget
+
+    Every decision clones the game once and plays out as many rollouts as fit in
+    time_budget seconds, each restoring the clone from a snapshot of the current
+    state. A rollout walks down the tree by the UCT rule, adds one step to it, and then
+    plays up to rollout_depth steps of a random policy that leans towards the food.
+    A rollout scores the points it won, less one if the snake died, plus a bonus for
+    ending near the food. The most visited first step is chosen."""
+
+    def __init__(self, seed=None, time_budget=0.02, rollout_depth=20, exploration=1.4):
+        """initialize the autopilot to search for time_budget seconds per decision"""
+        super().__init__(seed)
+        self.random = random.Random(seed)
+        self.time_budget = time_budget
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.rollouts = 0
+        self.search_seconds = 0.0
+        self.tree_size = 0
+
+    def decide(self, model):
+        """returns the first step most visited by the rollouts, or a direction that
+        does not end the game if no rollout fit in the time budget"""
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        # Simulated steps count on a virtual clock rather than read the wall clock
+        game = model.clone(
+            rng=random.Random(self.random.getrandbits(64)), clock=VirtualClock()
+        )
+        snapshot = game.snapshot()
+        root = MCTSNode()
+        rollouts = 0
+        while True:
+            game.restore(snapshot)
+            self.rollout(game, root, model.points)
+            rollouts += 1
+            if time.perf_counter() >= deadline:
+                break
+        self.rollouts += rollouts
+        self.search_seconds += time.perf_counter() - start
+        self.tree_size = root.size()
+
+        if not root.children:
+            return safe_direction(model)
+        return max(root.children, key=lambda d: root.children[d].visits)
+
+    def rollout(self, game, root, start_points):
+        """plays one rollout of game from the root of the tree and updates the
+        statistics of the nodes it passed"""
+        path = [root]
+        node = root
+        while game.state == "running":
+            if node.untried is None:
+                node.untried = safe_directions(game)
+                self.random.shuffle(node.untried)
+            if node.untried:
+                direction = node.untried.pop()
+                child = node.children[direction] = MCTSNode()
+                game.direction = direction
+                game.one_step()
+                path.append(child)
+                break
+            if not node.children:
+                break
+            direction, node = self.select(node)
+            game.direction = direction
+            game.one_step()
+            path.append(node)
+
+        for _ in range(self.rollout_depth):
+            if game.state != "running":
+                break
+            game.direction = self.rollout_direction(game)
+            game.one_step()
+
+        value = game.points - start_points
+        if game.state == "game over":
+            value -= 1
+        elif game.current_food_location is not None:
+            head_row, head_col = game.body_segments[0]
+            food_row, food_col = game.current_food_location
+            distance = abs(head_row - food_row) + abs(head_col - food_col)
+            value += 0.5 / (1 + distance)
+        for node in path:
+            node.visits += 1
+            node.value += value
+
+    def select(self, node):
+        """returns the direction and child of node with the highest UCT score"""
+        log_visits = math.log(node.visits)
+        best = None
+        best_score = -math.inf
+        for direction, child in node.children.items():
+            score = child.value / child.visits + self.exploration * math.sqrt(
+                log_visits / child.visits
+            )
+            if score > best_score:
+                best = direction, child
+                best_score = score
+        return best
+
+    def rollout_direction(self, game):
+        """returns a random direction that does not end the game on the next step, half
+        of the time one that moves towards the food"""
+        directions = safe_directions(game)
+        if not directions:
+            return game.direction
+        if game.current_food_location is not None and self.random.random() < 0.5:
+            head_row, head_col = game.body_segments[0]
+            food_row, food_col = game.current_food_location
+            row_distance = food_row - head_row
+            col_distance = food_col - head_col
+            for direction in directions:
+                row_step, col_step = DIRECTIONS[direction]
+                if row_distance * row_step + col_distance * col_step > 0:
+                    return direction
+        return self.random.choice(directions)
+
+    def rollouts_per_second(self):
+        """returns the mean number of rollouts played per second of search"""
+        return self.rollouts / self.search_seconds if self.search_seconds else 0.0
+
+    def latency_report(self):
+        """returns a line with the decision times, rollout rate and last tree size"""
+        return (
+            f"{super().latency_report()}, rollouts/s: {self.rollouts_per_second():.0f},"
+            f" tree size: {self.tree_size}"
+        )
+
+
+class MCTSNode:
+    """Node of the search tree, for the state reached by the steps leading to it"""
+
+    __slots__ = ("visits", "value", "children", "untried")
+
+    def __init__(self):
+        """initialize an unvisited node, whose untried steps are found on first visit"""
+        self.visits = 0
+        self.value = 0.0
+        self.children = {}
+        self.untried = None
+
+    def size(self):
+        """returns the number of nodes in the tree below and including this one"""
+        return 1 + sum(child.size() for child in self.children.values())
+
+
+@functools.lru_cache(maxsize=8)
+def hamiltonian_cycle(num_rows, num_cols):
+    """Returns arrays cycle and order for a cycle through every cell of the grid, where
+    cycle[i] is the row-major index of the i-th cell of the cycle and order[cell] is
+    the position of cell on the cycle. Raises ValueError if the grid has no such
+    cycle, which is when both sides are odd or one side is 1 and the other is not 2"""
+    if num_rows % 2 == 1 and num_cols % 2 == 1:
+        raise ValueError("a grid with an odd number of rows and columns has no cycle")
+    if min(num_rows, num_cols) == 1 and max(num_rows, num_cols) != 2:
+        raise ValueError("a grid one cell wide has no cycle")
+
+    # Build the cycle on a grid with an even number of rows, transposing if needed
+    transpose = num_rows % 2 == 1
+    rows, cols = (num_cols, num_rows) if transpose else (num_rows, num_cols)
+    cells = [(0, c) for c in range(cols)]
+    for r in range(1, rows):
+        if r % 2 == 1:
+            cells.extend((r, c) for c in range(cols - 1, 0, -1))
+        else:
+            cells.extend((r, c) for c in range(1, cols))
+    cells.extend((r, 0) for r in range(rows - 1, 0, -1))
+    if cols == 1:
+        # A grid of two rows and one column, which the lanes above do not cover
+        cells = [(0, 0), (1, 0)]
+
+    cycle = array("i", bytes(4 * len(cells)))
+    order = array("i", bytes(4 * len(cells)))
+    for position, (r, c) in enumerate(cells):
+        if transpose:
+            r, c = c, r
+        cell = r * num_cols + c
+        cycle[position] = cell
+        order[cell] = position
+    return cycle, order
+
+
+def step_direction(cell, next_cell):
+    """returns the direction that moves the snake from cell to the neighboring
+    next_cell, wrapping around the grid if they are on opposite edges"""
+    row_step = next_cell[0] - cell[0]
+    col_step = next_cell[1] - cell[1]
+    # Cells on opposite edges are neighbors across the edge in wrap around mode
+    if abs(row_step) > 1:
+        row_step = -1 if row_step > 0 else 1
+    if abs(col_step) > 1:
+        col_step = -1 if col_step > 0 else 1
+    return STEP_DIRECTIONS[(row_step, col_step)]
+
+
+# Direction of each (row, column) offset of one step
+STEP_DIRECTIONS = {offset: name for name, offset in DIRECTIONS.items()}
+
+# Direction code and (row, column) offset of each direction
+CODE_STEPS = [(code, DIRECTIONS[name]) for code, name in enumerate(DIRECTION_CODES)]
+
+
+def is_safe(model, direction):
+    """checks if the snake head can step in direction without ending the game"""
+    head = model.next_head(direction)
+    return head is not None and not model.occupancy[head[0] * model.num_cols + head[1]]
+
+
+def safe_direction(model):
+    """returns a direction that does not end the game on the next step, preferring the
+    current one, or the current direction if every direction does"""
+    for direction in (model.direction,) + DIRECTION_CODES:
+        if is_safe(model, direction):
+            return direction
+    return model.direction
+
+
+def safe_directions(model):
+    """returns a list of the directions that do not end the game on the next step"""
+    return [direction for direction in DIRECTION_CODES if is_safe(model, direction)]
+
+
+# Autopilots selectable by name, each called with an optional seed
+AUTOPILOTS = {
+    "bfs": BFSAutopilot,
+    "hamiltonian": HamiltonianAutopilot,
+    "mcts": MCTSAutopilot,
+}
+
+
+class AutopilotTest(unittest.TestCase):
+    def test_bfs_goes_around_body(self):
+        model = SnakeModel(4, 5, random.Random(0))
+        # The body blocks the way east along the top row
+        model.place_snake([(0, 1), (1, 1), (1, 2), (0, 2)], "North", food=(0, 4))
+        autopilot = BFSAutopilot()
+        self.assertEqual(autopilot(model), "West")
+        model.wrap_status = True
+        self.assertEqual(autopilot(model), "West")
+        self.assertEqual(autopilot.decisions, 2)
+
+    def test_bfs_reaches_food(self):
+        model = SnakeModel(6, 6, random.Random(1))
+        autopilot = BFSAutopilot()
+        while model.state == "running" and model.points < 10:
+            model.direction = autopilot(model)
+            model.one_step()
+        self.assertEqual(model.points, 10)
+
+    def test_hamiltonian_cycle(self):
+        for num_rows, num_cols in [(2, 2), (4, 3), (3, 4), (6, 6), (2, 1), (1, 2)]:
+            cycle, order = hamiltonian_cycle(num_rows, num_cols)
+            self.assertEqual(sorted(cycle), list(range(num_rows * num_cols)))
+            for position, cell in enumerate(cycle):
+                self.assertEqual(order[cell], position)
+                row, col = divmod(cell, num_cols)
+                next_cell = cycle[(position + 1) % len(cycle)]
+                next_row, next_col = divmod(next_cell, num_cols)
+                self.assertEqual(abs(row - next_row) + abs(col - next_col), 1)
+        self.assertRaises(ValueError, hamiltonian_cycle, 5, 5)
+
+    def test_hamiltonian_fills_grid(self):
+        # Grids two cells wide have neighbors one step apart either way round
+        for num_rows, num_cols in [(6, 8), (2, 9), (9, 2), (2, 2)]:
+            for wrap in (False, True):
+                for seed in range(4):
+                    model = SnakeModel(num_rows, num_cols, random.Random(seed))
+                    model.wrap_status = wrap
+                    autopilot = HamiltonianAutopilot()
+                    while model.state == "running":
+                        model.direction = autopilot(model)
+                        model.one_step()
+                    self.assertEqual(model.state, "game won")
+                    self.assertEqual(len(model.snake_body), num_rows * num_cols)
+        self.assertRaises(ValueError, HamiltonianAutopilot().check_grid, 31, 31)
+        BFSAutopilot().check_grid(31, 31)
+
+    def test_hamiltonian_fill_steps(self):
+        # Steps to fill the grid grow like the square of its cells
+        for side in (10, 14, 20):
+            cells = side * side
+            for seed in range(2):
+                model = SnakeModel(side, side, random.Random(seed), VirtualClock())
+                autopilot = HamiltonianAutopilot()
+                steps = 0
+                while model.state == "running":
+                    model.direction = autopilot(model)
+                    model.one_step()
+                    steps += 1
+                self.assertEqual(model.state, "game won")
+                self.assertLess(steps, cells * cells / 5)
+
+    def test_mcts_avoids_death_and_reports_rollouts(self):
+        model = SnakeModel(5, 5, random.Random(3))
+        # Only West leads away from the wall and the body
+        model.place_snake([(0, 4), (1, 4), (1, 3)], "North", food=(4, 0))
+        autopilot = MCTSAutopilot(seed=0, time_budget=0.01)
+        self.assertEqual(autopilot(model), "West")
+        self.assertGreater(autopilot.rollouts, 1)
+        self.assertGreater(autopilot.tree_size, 1)
+        self.assertIn("rollouts/s", autopilot.latency_report())
+        self.assertEqual(model.snake_body[0], (0, 4))
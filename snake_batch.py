@@ -0,0 +1,220 @@
+"""
+Module: snake_batch
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Steps many independent games of greedy snake in lockstep with NumPy
+
+SnakeBatch keeps the boards, heads, bodies and food of num_games games in NumPy
+arrays and applies one array of direction codes per step to all of them at once.
+Game i follows the same rules and random choices as a SnakeModel built with
+rng=random.Random(seeds[i]), so both give the same games for the same directions.
+
+    python snake_batch.py --games 1 100 10000 100000
+"""
+
+import argparse
+import random
+import time
+import unittest
+
+import numpy as np
+
+from snake_headless import RandomPolicy
+from snake_model import DIRECTION_CODES, DIRECTIONS, SnakeModel
+
+# Row and column offsets of one step, indexed by direction code
+ROW_STEPS = np.array([DIRECTIONS[name][0] for name in DIRECTION_CODES])
+COL_STEPS = np.array([DIRECTIONS[name][1] for name in DIRECTION_CODES])
+
+# Direction codes in the order SnakeModel.check_direction prefers them
+DISTANCE_ORDER = np.array(
+    [DIRECTION_CODES.index(name) for name in ("East", "West", "North", "South")]
+)
+
+
+class SnakeBatch:
+    """Batch of independent snake games on grids of the same size
+
+    Cells are numbered row * num_cols + col. Each body is a ring buffer in a row of
+    bodies, with its head at head_positions and the rest of the snake following it
+    around the ring, so a move writes one new head and drops one tail."""
+
+    def __init__(self, num_rows, num_cols, seeds, wrap=False):
+        """initialize one game for each seed"""
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.num_games = len(seeds)
+        self.size = num_rows * num_cols
+        self.wrap_status = wrap
+        self.random = [random.Random(seed) for seed in seeds]
+        self.games = np.arange(self.num_games)
+
+        # Board of each game, 1 where the cell is taken by the snake body
+        self.occupancy = np.zeros((self.num_games, self.size), dtype=np.uint8)
+
+        # Ring buffer of body cells of each game, long enough for a full board
+        self.bodies = np.zeros((self.num_games, self.size), dtype=np.int32)
+        self.head_positions = np.zeros(self.num_games, dtype=np.int64)
+        self.lengths = np.ones(self.num_games, dtype=np.int64)
+
+        self.heads = np.zeros(self.num_games, dtype=np.int64)
+        self.food = np.zeros(self.num_games, dtype=np.int64)
+        self.points = np.zeros(self.num_games, dtype=np.int64)
+        self.steps = np.zeros(self.num_games, dtype=np.int64)
+        self.running = np.ones(self.num_games, dtype=bool)
+
+        # Place the heads and the food with the same random choices as SnakeModel
+        for game, rng in enumerate(self.random):
+            self.heads[game] = rng.choice(range(self.size))
+            self.occupancy[game, self.heads[game]] = 1
+            self.food[game] = self.choose_open_cell(game)
+        self.bodies[:, 0] = self.heads
+
+        # Start each snake moving towards the wall it is furthest from
+        rows, cols = np.divmod(self.heads, num_cols)
+        distances = np.stack(
+            [num_cols - 1 - cols, cols, rows, num_rows - 1 - rows], axis=1
+        )
+        self.directions = DISTANCE_ORDER[np.argmax(distances, axis=1)]
+
+    def choose_open_cell(self, game):
+        """returns a random open cell of game, chosen like random.choice(open_cells)"""
+        open_cells = np.flatnonzero(self.occupancy[game] == 0)
+        return open_cells[self.random[game].choice(range(len(open_cells)))]
+
+    def one_step(self, directions=None):
+        """moves every running snake one cell, in the given array of direction codes or
+        else in its current direction, and returns the array of running games"""
+        if directions is not None:
+            self.directions = np.asarray(directions, dtype=np.int64)
+        games = self.games[self.running]
+        self.steps[games] += 1
+
+        # Find the next head of each running game
+        rows, cols = np.divmod(self.heads[games], self.num_cols)
+        rows = rows + ROW_STEPS[self.directions[games]]
+        cols = cols + COL_STEPS[self.directions[games]]
+        if self.wrap_status:
+            rows %= self.num_rows
+            cols %= self.num_cols
+            hits_wall = np.zeros(len(games), dtype=bool)
+        else:
+            hits_wall = (rows < 0) | (rows >= self.num_rows)
+            hits_wall |= (cols < 0) | (cols >= self.num_cols)
+        heads = np.where(hits_wall, 0, rows * self.num_cols + cols)
+
+        # Games end when the head leaves the grid or runs into the body
+        game_over = hits_wall | (self.occupancy[games, heads] == 1)
+        self.running[games[game_over]] = False
+        games = games[~game_over]
+        heads = heads[~game_over]
+
+        # Push the new heads
+        head_positions = (self.head_positions[games] - 1) % self.size
+        self.head_positions[games] = head_positions
+        self.bodies[games, head_positions] = heads
+        self.occupancy[games, heads] = 1
+        self.heads[games] = heads
+
+        # Free the tails of the snakes that did not eat
+        ate = heads == self.food[games]
+        hungry = games[~ate]
+        tail_positions = self.head_positions[hungry] + self.lengths[hungry]
+        tail_positions %= self.size
+        self.occupancy[hungry, self.bodies[hungry, tail_positions]] = 0
+
+        # Grow the snakes that ate and place their new food, ending the games where
+        # the snake fills the grid
+        fed = games[ate]
+        self.lengths[fed] += 1
+        self.points[fed] += 1
+        for game in fed:
+            if self.lengths[game] < self.size:
+                self.food[game] = self.choose_open_cell(game)
+            else:
+                self.food[game] = -1
+                self.running[game] = False
+        return self.running
+
+    def body(self, game):
+        """returns the (row, column) cells of the snake in game, head first"""
+        positions = self.head_positions[game] + np.arange(self.lengths[game])
+        cells = self.bodies[game, positions % self.size]
+        return [divmod(int(cell), self.num_cols) for cell in cells]
+
+
+def benchmark(num_games, num_rows, num_cols, num_steps, seed=0):
+    """Returns the game-steps per second of a batch of num_games games turning at
+    random in wrap around mode"""
+    batch = SnakeBatch(num_rows, num_cols, range(seed, seed + num_games), wrap=True)
+    turns = np.random.default_rng(seed)
+    game_steps = 0
+    start = time.perf_counter()
+    for step in range(num_steps):
+        # Turn left, go straight or turn right, never back into the neck
+        directions = (batch.directions + turns.integers(-1, 2, num_games)) % 4
+        game_steps += int(np.count_nonzero(batch.running))
+        if not batch.one_step(directions).any():
+            break
+    seconds = time.perf_counter() - start
+    return game_steps / seconds if seconds else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched snake engine")
+    parser.add_argument(
+        "--games", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000]
+    )
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'games':>8} {'game-steps/sec':>16}")
+    for num_games in args.games:
+        rate = benchmark(num_games, args.rows, args.cols, args.steps)
+        print(f"{num_games:>8} {rate:>16.0f}")
+
+
+class SnakeBatchTest(unittest.TestCase):
+    def test_matches_snake_model(self):
+        seeds = range(40)
+        num_steps = 400
+        for wrap in (False, True):
+            # Play the games one by one and record their directions and states
+            directions = np.zeros((num_steps, len(seeds)), dtype=np.int64)
+            states = []
+            for game, seed in enumerate(seeds):
+                model = SnakeModel(6, 7, random.Random(seed))
+                model.wrap_status = wrap
+                policy = RandomPolicy(seed=seed)
+                states.append([])
+                for step in range(num_steps):
+                    if model.state == "running":
+                        model.direction = policy(model)
+                        model.one_step()
+                    directions[step, game] = DIRECTION_CODES.index(model.direction)
+                    states[game].append(
+                        (
+                            model.state == "running",
+                            list(model.snake_body),
+                            model.current_food_location,
+                            model.points,
+                        )
+                    )
+            self.assertGreater(max(state[-1][3] for state in states), 5)
+
+            batch = SnakeBatch(6, 7, seeds, wrap=wrap)
+            for step in range(num_steps):
+                batch.one_step(directions[step])
+                for game in range(len(seeds)):
+                    running, body, food, points = states[game][step]
+                    self.assertEqual(batch.running[game], running)
+                    self.assertEqual(batch.body(game), body)
+                    self.assertEqual(divmod(int(batch.food[game]), 7), food)
+                    self.assertEqual(batch.points[game], points)
+
+
+if __name__ == "__main__":
+    main()
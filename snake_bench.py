@@ -0,0 +1,272 @@
+"""
+Module: snake_bench
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Benchmarks the hot paths of SnakeModel
+
+Times one_step, move_snake, check_game_over, check_food, check_open_cells, reset,
+snapshot, restore and clone on square grids of several sizes, with snakes from a
+single segment up to 90% of the grid, and writes the results as JSON so that runs
+of two versions can be compared. one_step and check_food are also timed on steps
+where the snake eats, which place new food on a random open cell.
+
+    python snake_bench.py --json new.json --label my-change
+    python snake_bench.py --compare old.json new.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import time
+
+from snake_model import DIRECTIONS, SnakeModel
+
+OPERATIONS = (
+    "one_step",
+    "one_step_eating",
+    "move_snake",
+    "check_game_over",
+    "check_food",
+    "check_food_eating",
+    "check_open_cells",
+    "reset",
+    "snapshot",
+    "restore",
+    "clone",
+)
+
+
+def serpentine(num_rows, num_cols):
+    """returns every (row, column) cell of the grid in an order where each cell is next
+    to the one before it, going along even rows to the east and odd rows to the west"""
+    path = []
+    for r in range(num_rows):
+        cols = range(num_cols) if r % 2 == 0 else range(num_cols - 1, -1, -1)
+        path.extend((r, c) for c in cols)
+    return path
+
+
+def turns(path):
+    """returns the direction from each cell of path to the next one"""
+    names = {offset: name for name, offset in DIRECTIONS.items()}
+    return [
+        names[(ahead[0] - cell[0], ahead[1] - cell[1])]
+        for cell, ahead in zip(path, path[1:])
+    ]
+
+
+def place(model, path, length):
+    """puts a running snake of length cells on the start of path, with the food on the
+    last cell of the path"""
+    model.place_snake(path[length - 1 :: -1], food=path[-1])
+    model.state = "running"
+    model.start_time = model.clock.time()
+
+
+def measure(model, path, directions, length, operation, min_time, max_calls):
+    """Returns the number of calls made and the seconds spent in calls to operation on
+    a snake of length cells steered along path by directions, placing the snake again
+    whenever it runs out of path"""
+    # The snake can take this many steps along the path before it reaches the food
+    room = len(path) - length - 1
+    moves = operation in (
+        "one_step",
+        "one_step_eating",
+        "move_snake",
+        "check_food",
+        "check_food_eating",
+    )
+    calls = 0
+    seconds = 0.0
+    clock = time.perf_counter
+    while calls < max_calls and (seconds < min_time or calls == 0):
+        if moves and room < 1:
+            break
+        place(model, path, length)
+        model.direction = directions[length - 1]
+        batch = min(room if moves else max_calls, max_calls - calls)
+        if operation == "one_step":
+            start = clock()
+            for call in range(batch):
+                model.direction = directions[length - 1 + call]
+                model.one_step()
+            seconds += clock() - start
+        elif operation == "one_step_eating":
+            # The food is put just ahead of the head before each step, so every step
+            # eats it and places new food
+            for call in range(batch):
+                model.direction = directions[length - 1 + call]
+                model.current_food_location = path[length + call]
+                start = clock()
+                model.one_step()
+                seconds += clock() - start
+        elif operation == "move_snake":
+            # check_food finishes each move, but is not timed
+            for call in range(batch):
+                model.direction = directions[length - 1 + call]
+                start = clock()
+                model.move_snake()
+                seconds += clock() - start
+                model.check_food()
+        elif operation == "check_food":
+            for call in range(batch):
+                model.direction = directions[length - 1 + call]
+                model.move_snake()
+                start = clock()
+                model.check_food()
+                seconds += clock() - start
+        elif operation == "check_food_eating":
+            for call in range(batch):
+                model.direction = directions[length - 1 + call]
+                model.move_snake()
+                model.current_food_location = model.body_segments[0]
+                start = clock()
+                model.check_food()
+                seconds += clock() - start
+        elif operation == "check_game_over":
+            start = clock()
+            for call in range(batch):
+                model.check_game_over()
+            seconds += clock() - start
+        elif operation in ("snapshot", "clone"):
+            method = getattr(model, operation)
+            start = clock()
+            for call in range(batch):
+                method()
+            seconds += clock() - start
+        elif operation == "restore":
+            snapshot = model.snapshot()
+            start = clock()
+            for call in range(batch):
+                model.restore(snapshot)
+            seconds += clock() - start
+        elif operation == "check_open_cells":
+            batch = 1
+            start = clock()
+            model.check_open_cells()
+            seconds += clock() - start
+        else:  # operation == reset
+            batch = 1
+            start = clock()
+            model.reset()
+            seconds += clock() - start
+        calls += batch
+    return calls, seconds
+
+
+def run(sizes, fills, operations=OPERATIONS, min_time=0.2, max_calls=100000, seed=0):
+    """Returns a list of result dictionaries, one for each size, fill and operation,
+    placing the food with a random.Random seeded with seed"""
+    results = []
+    for size in sizes:
+        model = SnakeModel(size, size, random.Random(seed))
+        path = serpentine(size, size)
+        directions = turns(path)
+        lengths = sorted({1} | {max(1, int(fill * size * size)) for fill in fills})
+        for length in lengths:
+            # Leave at least one cell to move into and one for the food
+            length = min(length, size * size - 2)
+            for operation in operations:
+                calls, seconds = measure(
+                    model, path, directions, length, operation, min_time, max_calls
+                )
+                results.append(
+                    {
+                        "num_rows": size,
+                        "num_cols": size,
+                        "snake_length": length,
+                        "operation": operation,
+                        "calls": calls,
+                        "seconds": seconds,
+                        "usec_per_call": seconds / calls * 1e6,
+                    }
+                )
+                print(
+                    f"{size:>5}x{size:<5} {length:>8} {operation:>17}"
+                    f" {seconds / calls * 1e6:>12.2f} us"
+                )
+    return results
+
+
+def compare(old_path, new_path):
+    """Prints the time per call in new_path relative to old_path for every result the
+    two files have in common"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def key(result):
+        return (result["num_rows"], result["snake_length"], result["operation"])
+
+    old_results = {key(result): result for result in old["results"]}
+    print(f"{old.get('label')} -> {new.get('label')}")
+    for result in new["results"]:
+        before = old_results.get(key(result))
+        if before is None:
+            continue
+        ratio = result["usec_per_call"] / before["usec_per_call"]
+        print(
+            f"{result['num_rows']:>5}x{result['num_cols']:<5}"
+            f" {result['snake_length']:>8} {result['operation']:>17}"
+            f" {before['usec_per_call']:>12.2f} us"
+            f" {result['usec_per_call']:>12.2f} us {ratio:>7.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SnakeModel hot paths")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 30, 100, 300, 1000]
+    )
+    parser.add_argument(
+        "--fills",
+        type=float,
+        nargs="+",
+        default=[0.1, 0.5, 0.9],
+        help="snake lengths as fractions of the grid, on top of a single segment",
+    )
+    parser.add_argument(
+        "--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS
+    )
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--max-calls", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", help="name of the version being measured")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two JSON files"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(
+        args.sizes,
+        args.fills,
+        args.operations,
+        args.min_time,
+        args.max_calls,
+        args.seed,
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "label": args.label,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Module: snake_broadcast
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Streams a game to any number of spectators as small binary deltas
+
+A Broadcaster encodes each step of a SnakeModel once, from its changed_cells, and
+sends the same bytes to every subscriber. Most messages are deltas of a few
+bytes: the new head, whether the tail moved, where the food went and the points.
+Every keyframe_interval steps, and on the step after someone subscribes, it sends
+a keyframe with the whole snake instead, so that spectators who join late can
+sync. Numbers are unsigned LEB128 varints, cells are numbered row * num_cols + col,
+and each message goes out behind its length as a varint. The layouts are
+
+    keyframe  b"K", step, num_rows, num_cols, state, points, food + 1 or 0,
+              length, cells of the body head first
+    delta     b"D", step, flags, head if flags & MOVED,
+              food + 1 or 0 if flags & FOOD_MOVED, points
+
+where bits 4 and 5 of flags hold the state code.
+
+    python snake_broadcast.py --policy bfs --steps 5000 --subscribers 1000
+"""
+
+import argparse
+import random
+import time
+import unittest
+from collections import deque
+
+from snake_headless import POLICIES
+from snake_metrics import RollingHistogram
+from snake_model import SnakeModel, VirtualClock
+
+KEYFRAME = b"K"[0]
+DELTA = b"D"[0]
+STATES = ("running", "game over", "game won")
+
+# Flags of a delta
+MOVED = 1
+TAIL_REMOVED = 2
+FOOD_MOVED = 4
+STATE_SHIFT = 4
+
+
+def write_varint(out, value):
+    """appends value to the bytearray out as an unsigned LEB128 varint"""
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, position):
+    """returns the varint in data at position and the position after it"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class Broadcaster:
+    """Sends each step of a game to every subscriber, encoded once"""
+
+    def __init__(self, keyframe_interval=100):
+        """initialize a broadcaster with no subscribers"""
+        self.keyframe_interval = keyframe_interval
+        self.subscribers = []
+        self.keyframe_due = True
+        self.since_keyframe = 0
+        self.messages = 0
+        self.keyframes = 0
+        self.bytes_encoded = 0
+        self.encode_seconds = RollingHistogram(window=10000)
+
+    def subscribe(self, send):
+        """adds the function send, called with the bytes of each message, and sends a
+        keyframe on the next step"""
+        self.subscribers.append(send)
+        self.keyframe_due = True
+
+    def unsubscribe(self, send):
+        """removes a subscriber"""
+        self.subscribers.remove(send)
+
+    def restart(self):
+        """sends a keyframe on the next step, for a game that started over"""
+        self.keyframe_due = True
+
+    def publish(self, model, step):
+        """encodes the step of model numbered step, if anyone is watching, and sends
+        it to every subscriber"""
+        if not self.subscribers:
+            return
+        message = self.encode(model, step)
+        for send in self.subscribers:
+            send(message)
+
+    def encode(self, model, step):
+        """returns the message for the step of model, with its length in front"""
+        start = time.perf_counter()
+        if self.keyframe_due or self.since_keyframe >= self.keyframe_interval:
+            body = encode_keyframe(model, step)
+            self.keyframe_due = False
+            self.since_keyframe = 0
+            self.keyframes += 1
+        else:
+            body = encode_delta(model, step)
+        self.since_keyframe += 1
+        message = bytearray()
+        write_varint(message, len(body))
+        message += body
+        message = bytes(message)
+        self.encode_seconds.add(time.perf_counter() - start)
+        self.messages += 1
+        self.bytes_encoded += len(message)
+        return message
+
+    def report(self):
+        """returns a line with the bytes and encode time per step"""
+        mean = self.bytes_encoded / self.messages if self.messages else 0.0
+        return (
+            f"Messages: {self.messages}, keyframes: {self.keyframes},"
+            f" bytes/step: {mean:.1f},"
+            f" encode p50/p99: {self.encode_seconds.percentile(0.5) * 1e6:.1f}"
+            f"/{self.encode_seconds.percentile(0.99) * 1e6:.1f} us"
+        )
+
+
+def encode_keyframe(model, step):
+    """returns a keyframe of the state of model after the step numbered step"""
+    num_cols = model.num_cols
+    out = bytearray([KEYFRAME])
+    write_varint(out, step)
+    write_varint(out, model.num_rows)
+    write_varint(out, num_cols)
+    write_varint(out, STATES.index(model.state))
+    write_varint(out, model.points)
+    food = model.current_food_location
+    write_varint(out, 0 if food is None else food[0] * num_cols + food[1] + 1)
+    write_varint(out, len(model.body_segments))
+    for row, col in model.body_segments:
+        write_varint(out, row * num_cols + col)
+    return out
+
+
+def encode_delta(model, step):
+    """returns a delta from the state before the step numbered step of model to the
+    state after it, read from changed_cells"""
+    num_cols = model.num_cols
+    flags = STATES.index(model.state) << STATE_SHIFT
+    head = food = None
+    for cell, kind in model.changed_cells:
+        if kind == "head":
+            flags |= MOVED
+            head = cell
+        elif kind == "open":
+            flags |= TAIL_REMOVED
+        elif kind == "food":
+            flags |= FOOD_MOVED
+            food = cell
+    if flags & MOVED and model.current_food_location is None:
+        # The snake ate the last food and filled the grid
+        flags |= FOOD_MOVED
+    out = bytearray([DELTA])
+    write_varint(out, step)
+    out.append(flags)
+    if head is not None:
+        write_varint(out, head[0] * num_cols + head[1])
+    if flags & FOOD_MOVED:
+        write_varint(out, 0 if food is None else food[0] * num_cols + food[1] + 1)
+    write_varint(out, model.points)
+    return out
+
+
+class Spectator:
+    """Rebuilds a game from the messages of a Broadcaster, once it has seen a
+    keyframe"""
+
+    def __init__(self):
+        """initialize a spectator waiting for a keyframe"""
+        self.synced = False
+        self.num_rows = 0
+        self.num_cols = 0
+        self.step = 0
+        self.state = None
+        self.points = 0
+        self.food = None
+        self.body = deque()
+
+    def apply(self, message):
+        """updates the game from one message without its length, and returns False
+        if it was a delta that came before the first keyframe"""
+        kind = message[0]
+        if kind != KEYFRAME and not self.synced:
+            return False
+        self.step, position = read_varint(message, 1)
+        if kind == KEYFRAME:
+            self.num_rows, position = read_varint(message, position)
+            self.num_cols, position = read_varint(message, position)
+            state, position = read_varint(message, position)
+            self.points, position = read_varint(message, position)
+            food, position = read_varint(message, position)
+            self.food = None if food == 0 else divmod(food - 1, self.num_cols)
+            length, position = read_varint(message, position)
+            self.body.clear()
+            for _ in range(length):
+                cell, position = read_varint(message, position)
+                self.body.append(divmod(cell, self.num_cols))
+            self.synced = True
+        else:
+            flags = message[position]
+            position += 1
+            state = flags >> STATE_SHIFT
+            if flags & MOVED:
+                cell, position = read_varint(message, position)
+                self.body.appendleft(divmod(cell, self.num_cols))
+                if flags & TAIL_REMOVED:
+                    self.body.pop()
+            if flags & FOOD_MOVED:
+                food, position = read_varint(message, position)
+                self.food = None if food == 0 else divmod(food - 1, self.num_cols)
+            self.points, position = read_varint(message, position)
+        self.state = STATES[state]
+        return True
+
+
+def read_messages(data):
+    """returns the messages, without their lengths, in the bytes of a stream"""
+    messages = []
+    position = 0
+    while position < len(data):
+        length, position = read_varint(data, position)
+        messages.append(data[position : position + length])
+        position += length
+    return messages
+
+
+def benchmark(num_rows, num_cols, policy, num_steps, num_subscribers, interval, seed):
+    """Plays one headless game of num_steps steps at most, broadcast to
+    num_subscribers subscribers that count the bytes they receive, and returns the
+    Broadcaster, the number of steps, the bytes per step of sending a keyframe on
+    every step instead, and the seconds spent publishing a step"""
+    model = SnakeModel(num_rows, num_cols, random.Random(seed), VirtualClock())
+    broadcaster = Broadcaster(interval)
+    received = [0] * num_subscribers
+
+    def receiver(subscriber):
+        def receive(message):
+            received[subscriber] += len(message)
+
+        return receive
+
+    for subscriber in range(num_subscribers):
+        broadcaster.subscribe(receiver(subscriber))
+    keyframe_bytes = 0
+    publish_seconds = 0.0
+    steps = 0
+    while steps < num_steps and model.state == "running":
+        model.direction = policy(model)
+        model.one_step()
+        steps += 1
+        start = time.perf_counter()
+        broadcaster.publish(model, steps)
+        publish_seconds += time.perf_counter() - start
+        keyframe = encode_keyframe(model, steps)
+        keyframe_bytes += len(keyframe) + (1 if len(keyframe) < 0x80 else 2)
+    if any(count != broadcaster.bytes_encoded for count in received):
+        raise RuntimeError(
+            f"subscribers received {min(received)} to {max(received)} bytes"
+            f" of the {broadcaster.bytes_encoded} bytes encoded"
+        )
+    return broadcaster, steps, keyframe_bytes / steps, publish_seconds / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the spectator stream")
+    parser.add_argument("--rows", type=int, default=30)
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="bfs")
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--keyframe-interval", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    broadcaster, steps, keyframe_bytes, publish_seconds = benchmark(
+        args.rows,
+        args.cols,
+        POLICIES[args.policy](seed=args.seed),
+        args.steps,
+        args.subscribers,
+        args.keyframe_interval,
+        args.seed,
+    )
+    mean = broadcaster.bytes_encoded / broadcaster.messages
+    print(f"Steps: {steps}")
+    print(broadcaster.report())
+    print(f"Keyframe on every step: {keyframe_bytes:.1f} bytes/step")
+    print(f"Deltas save {1 - mean / keyframe_bytes:.1%} of the bytes")
+    print(
+        f"Publish to {args.subscribers} subscribers:"
+        f" {publish_seconds * 1e6:.1f} us/step"
+    )
+
+
+class BroadcastTest(unittest.TestCase):
+    def test_varint(self):
+        out = bytearray()
+        for value in (0, 1, 127, 128, 300, 2**40):
+            write_varint(out, value)
+        position = 0
+        for value in (0, 1, 127, 128, 300, 2**40):
+            read, position = read_varint(out, position)
+            self.assertEqual(read, value)
+        self.assertEqual(position, len(out))
+
+    def test_benchmark(self):
+        policy = POLICIES["bfs"](seed=1)
+        broadcaster, steps, keyframe_bytes, publish_seconds = benchmark(
+            10, 10, policy, 300, 5, 50, 1
+        )
+        self.assertEqual(broadcaster.messages, steps)
+        self.assertLess(broadcaster.bytes_encoded / steps, keyframe_bytes)
+        self.assertGreater(publish_seconds, 0)
+
+    def test_late_spectator(self):
+        model = SnakeModel(8, 8, random.Random(3), VirtualClock())
+        model.wrap_status = True
+        policy = POLICIES["bfs"](seed=3)
+        broadcaster = Broadcaster(keyframe_interval=20)
+        stream = bytearray()
+        broadcaster.subscribe(stream.extend)
+        spectator = Spectator()
+        late = Spectator()
+        late_stream = bytearray()
+        keyframe_steps = []
+        step = 0
+        while model.state == "running":
+            model.direction = policy(model)
+            model.one_step()
+            step += 1
+            if step == 25:
+                # The late spectator syncs on the keyframe of this step
+                broadcaster.subscribe(late_stream.extend)
+            broadcaster.publish(model, step)
+            for watcher, data in ((spectator, stream), (late, late_stream)):
+                for message in read_messages(bytes(data)):
+                    if watcher is spectator and message[0] == KEYFRAME:
+                        keyframe_steps.append(step)
+                    watcher.apply(message)
+                data.clear()
+            for watcher in (spectator, late) if step >= 25 else (spectator,):
+                self.assertEqual(list(watcher.body), list(model.body_segments))
+                self.assertEqual(watcher.food, model.current_food_location)
+                self.assertEqual(watcher.points, model.points)
+                self.assertEqual(watcher.state, model.state)
+                self.assertEqual(watcher.step, step)
+        self.assertGreater(step, 60)
+        # A keyframe on the first step, on the step the late spectator joined, and
+        # 20 steps after the last one
+        self.assertEqual(keyframe_steps[:5], [1, 21, 25, 45, 65])
+        self.assertEqual(broadcaster.keyframes, len(keyframe_steps))
+        self.assertLess(broadcaster.bytes_encoded / broadcaster.messages, 12)
+        # A spectator ignores deltas until it has a keyframe
+        self.assertFalse(Spectator().apply(encode_delta(model, step)))
+
+
+if __name__ == "__main__":
+    main()
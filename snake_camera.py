@@ -0,0 +1,93 @@
+"""
+Module: snake_camera
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Camera that shows a window of a large grid around the snake head
+
+Only view_rows by view_cols cells of the grid are drawn. The camera stands still
+while the head is more than margin cells inside the edges of the window, and
+otherwise jumps to center the head, so that it scrolls once every few steps rather
+than on every step. Redrawing the window after a jump costs one lookup per visible
+cell, however large the grid is.
+"""
+
+import unittest
+
+
+class Camera:
+    """Window of the grid shown by the view, with its top left cell at (top, left)"""
+
+    def __init__(self, num_rows, num_cols, view_rows, view_cols, margin=None):
+        """initialize a camera over a num_rows by num_cols grid, showing at most
+        view_rows by view_cols cells, that keeps the head margin cells inside the
+        edges of the window, a quarter of its size by default"""
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.view_rows = min(view_rows, num_rows)
+        self.view_cols = min(view_cols, num_cols)
+        if margin is None:
+            margin = min(self.view_rows, self.view_cols) // 4
+        self.margin = margin
+        self.top = 0
+        self.left = 0
+        self.scrolls = 0
+
+    def follow(self, row, col):
+        """moves the window to center the cell in row and column if it is within the
+        margin of the edges, and returns True if the window moved"""
+        top = self.top
+        left = self.left
+        if not top + self.margin <= row < top + self.view_rows - self.margin:
+            top = row - self.view_rows // 2
+        if not left + self.margin <= col < left + self.view_cols - self.margin:
+            left = col - self.view_cols // 2
+        top = max(0, min(top, self.num_rows - self.view_rows))
+        left = max(0, min(left, self.num_cols - self.view_cols))
+        if (top, left) == (self.top, self.left):
+            return False
+        self.top = top
+        self.left = left
+        self.scrolls += 1
+        return True
+
+    def to_view(self, row, col):
+        """returns the (row, column) in the view of the cell in row and column of the
+        grid, or None if it is outside the window"""
+        view_row = row - self.top
+        view_col = col - self.left
+        if 0 <= view_row < self.view_rows and 0 <= view_col < self.view_cols:
+            return view_row, view_col
+        return None
+
+    def visible_rows(self):
+        """returns the range of the grid rows in the window"""
+        return range(self.top, self.top + self.view_rows)
+
+    def visible_cols(self):
+        """returns the range of the grid columns in the window"""
+        return range(self.left, self.left + self.view_cols)
+
+
+class CameraTest(unittest.TestCase):
+    def test_follow(self):
+        camera = Camera(100, 200, 20, 40)
+        self.assertEqual(camera.margin, 5)
+        self.assertFalse(camera.follow(10, 10))
+        self.assertEqual(camera.to_view(10, 10), (10, 10))
+        self.assertEqual(camera.to_view(10, 40), None)
+        # Within the margin of the bottom edge, so the head is centered
+        self.assertTrue(camera.follow(15, 10))
+        self.assertEqual((camera.top, camera.left), (5, 0))
+        self.assertEqual(camera.to_view(15, 10), (10, 10))
+        # The window stays on the grid
+        self.assertTrue(camera.follow(99, 199))
+        self.assertEqual((camera.top, camera.left), (80, 160))
+        self.assertEqual(list(camera.visible_rows()), list(range(80, 100)))
+        self.assertEqual(camera.scrolls, 2)
+
+    def test_small_grid(self):
+        camera = Camera(10, 10, 30, 30)
+        self.assertEqual((camera.view_rows, camera.view_cols), (10, 10))
+        for row in range(10):
+            self.assertFalse(camera.follow(row, 9 - row))
@@ -0,0 +1,378 @@
+"""
+Module: snake_frames
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Renders games of greedy snake to image files without a display
+
+A FrameRenderer draws the grid into two buffers allocated once, an RGB frame and
+a frame of palette indices, and after each step repaints only the cells the step
+changed. Frames are streamed to a writer as they are drawn, so a video is never
+held in memory: PPMWriter writes binary PPM images, either numbered files or one
+after another to a stream, and GIFWriter appends each frame to an animated GIF,
+compressed with LZW in pure Python and cropped to the cells that changed.
+
+    python snake_frames.py replay replays/7.replay --gif game7.gif
+    python snake_frames.py play --policy bfs --seed 3 --ppm frames/%05d.ppm
+"""
+
+import argparse
+import io
+import os
+import random
+import struct
+import sys
+import unittest
+
+from snake_headless import POLICIES
+from snake_replay import Replay, record_episode, replay_steps
+
+# Kinds of cell, in palette order, and their colors as in the window
+KINDS = ("open", "head", "body", "food")
+PALETTE = ((255, 255, 255), (0, 0, 0), (0, 0, 255), (255, 0, 0))
+
+
+class FrameRenderer:
+    """Draws a num_rows by num_cols grid at cell_pixels pixels per cell"""
+
+    def __init__(self, num_rows, num_cols, cell_pixels=4):
+        """initialize an all open frame"""
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.cell_pixels = cell_pixels
+        self.width = num_cols * cell_pixels
+        self.height = num_rows * cell_pixels
+        self.rgb = bytearray(3 * self.width * self.height)
+        self.indices = bytearray(self.width * self.height)
+        # One cell wide run of pixels of each kind
+        self.rgb_runs = {
+            kind: bytes(color) * cell_pixels for kind, color in zip(KINDS, PALETTE)
+        }
+        self.index_runs = {
+            kind: bytes([index]) * cell_pixels for index, kind in enumerate(KINDS)
+        }
+        self.dirty = None
+        self.clear()
+
+    def clear(self):
+        """paints every cell open, reusing the frame buffers"""
+        self.rgb[:] = bytes(PALETTE[0]) * (self.width * self.height)
+        self.indices[:] = bytes(self.width * self.height)
+        self.dirty = [0, 0, self.num_rows - 1, self.num_cols - 1]
+
+    def paint(self, row, col, kind):
+        """paints the cell in row and column with the color of kind"""
+        pixels = self.cell_pixels
+        rgb_run = self.rgb_runs[kind]
+        index_run = self.index_runs[kind]
+        start = row * pixels * self.width + col * pixels
+        for _ in range(pixels):
+            self.indices[start : start + pixels] = index_run
+            self.rgb[3 * start : 3 * (start + pixels)] = rgb_run
+            start += self.width
+        dirty = self.dirty
+        if dirty is None:
+            self.dirty = [row, col, row, col]
+        else:
+            dirty[0] = min(dirty[0], row)
+            dirty[1] = min(dirty[1], col)
+            dirty[2] = max(dirty[2], row)
+            dirty[3] = max(dirty[3], col)
+
+    def draw(self, model):
+        """draws the whole grid of model"""
+        self.clear()
+        for index, (row, col) in enumerate(model.snake_body):
+            self.paint(row, col, "body" if index else "head")
+        if model.current_food_location is not None:
+            self.paint(*model.current_food_location, "food")
+
+    def update(self, model):
+        """repaints the cells that changed in the last step of model"""
+        for (row, col), kind in model.changed_cells:
+            self.paint(row, col, kind)
+
+    def take_dirty(self):
+        """returns the (left, top, width, height) in pixels of the box around the
+        cells painted since the last call, or None if none were"""
+        if self.dirty is None:
+            return None
+        top, left, bottom, right = self.dirty
+        self.dirty = None
+        pixels = self.cell_pixels
+        return (
+            left * pixels,
+            top * pixels,
+            (right - left + 1) * pixels,
+            (bottom - top + 1) * pixels,
+        )
+
+
+class PPMWriter:
+    """Writes frames as binary PPM images, to the numbered files of a pattern such
+    as frames/%05d.ppm, or one after another to a binary stream"""
+
+    def __init__(self, target):
+        """initialize a writer to a file name pattern or a binary stream"""
+        self.target = target
+        self.frames = 0
+
+    def write(self, renderer):
+        """writes the RGB frame of renderer"""
+        header = b"P6\n%d %d\n255\n" % (renderer.width, renderer.height)
+        if isinstance(self.target, str):
+            with open(self.target % self.frames, "wb") as file:
+                file.write(header)
+                file.write(renderer.rgb)
+        else:
+            self.target.write(header)
+            self.target.write(renderer.rgb)
+        self.frames += 1
+
+    def close(self):
+        """flushes the stream, if writing to one"""
+        if not isinstance(self.target, str):
+            self.target.flush()
+
+
+class GIFWriter:
+    """Writes frames to a looping animated GIF in a binary stream, each frame delay
+    hundredths of a second long and holding only the box of changed pixels"""
+
+    def __init__(self, stream, delay=10):
+        """initialize the writer, which writes the header with the first frame"""
+        self.stream = stream
+        self.delay = delay
+        self.frames = 0
+
+    def write(self, renderer):
+        """appends the pixels of renderer that changed since the last frame"""
+        stream = self.stream
+        if self.frames == 0:
+            stream.write(b"GIF89a")
+            # Logical screen with a global table of 4 colors, which is 2 bits
+            stream.write(
+                struct.pack("<HHBBB", renderer.width, renderer.height, 0x81, 0, 0)
+            )
+            stream.write(b"".join(bytes(color) for color in PALETTE))
+            stream.write(b"!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+        box = renderer.take_dirty()
+        if box is None:
+            # Nothing changed, so repeat one pixel to keep the frame
+            box = (0, 0, 1, 1)
+        left, top, width, height = box
+        pixels = bytearray()
+        start = top * renderer.width + left
+        for _ in range(height):
+            pixels += renderer.indices[start : start + width]
+            start += renderer.width
+        # Graphic control extension: leave the frame in place, then wait delay
+        stream.write(struct.pack("<3sBHBB", b"!\xf9\x04", 0x04, self.delay, 0, 0))
+        stream.write(struct.pack("<BHHHHB", 0x2C, left, top, width, height, 0))
+        stream.write(b"\x02")
+        data = lzw_encode(pixels, 2)
+        for start in range(0, len(data), 255):
+            block = data[start : start + 255]
+            stream.write(bytes([len(block)]))
+            stream.write(block)
+        stream.write(b"\x00")
+        self.frames += 1
+
+    def close(self):
+        """writes the trailer of the GIF"""
+        self.stream.write(b";")
+        self.stream.flush()
+
+
+def lzw_encode(data, min_code_size):
+    """returns the GIF variant of LZW compression of data, whose bytes are less than
+    2 ** min_code_size, as bytes packed from the least significant bit"""
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    code_size = min_code_size + 1
+    next_code = end_code + 1
+    table = {}
+    out = bytearray()
+    bits = clear_code
+    num_bits = code_size
+
+    prefix = data[0]
+    for byte in data[1:]:
+        key = prefix << 8 | byte
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << num_bits
+        num_bits += code_size
+        if next_code < 4096:
+            table[key] = next_code
+            if next_code == 1 << code_size and code_size < 12:
+                code_size += 1
+            next_code += 1
+        else:
+            # The table is full, so start a new one
+            bits |= clear_code << num_bits
+            num_bits += code_size
+            table.clear()
+            code_size = min_code_size + 1
+            next_code = end_code + 1
+        while num_bits >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            num_bits -= 8
+        prefix = byte
+
+    bits |= prefix << num_bits
+    num_bits += code_size
+    bits |= end_code << num_bits
+    num_bits += code_size
+    while num_bits > 0:
+        out.append(bits & 0xFF)
+        bits >>= 8
+        num_bits -= 8
+    return bytes(out)
+
+
+def export_steps(models, writers, cell_pixels=4):
+    """renders each SnakeModel of one game yielded by models to every writer, and
+    returns the number of frames"""
+    renderer = None
+    for model in models:
+        if renderer is None:
+            renderer = FrameRenderer(model.num_rows, model.num_cols, cell_pixels)
+            renderer.draw(model)
+        else:
+            renderer.update(model)
+        for writer in writers:
+            writer.write(renderer)
+    for writer in writers:
+        writer.close()
+    return writers[0].frames if writers else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render snake games to images")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="render a replay file")
+    replay_parser.add_argument("file")
+    play_parser = commands.add_parser("play", help="render a new headless game")
+    play_parser.add_argument("--rows", type=int, default=30)
+    play_parser.add_argument("--cols", type=int, default=30)
+    play_parser.add_argument("--seed", type=int, default=0)
+    play_parser.add_argument("--max-steps", type=int, default=1000)
+    play_parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    play_parser.add_argument("--wrap", action="store_true")
+    for command_parser in (replay_parser, play_parser):
+        command_parser.add_argument("--gif", help="write an animated GIF to this file")
+        command_parser.add_argument(
+            "--ppm",
+            help="write PPM images to files named by this pattern, such as"
+            " frames/%%05d.ppm, or to standard output if it is -",
+        )
+        command_parser.add_argument("--cell-pixels", type=int, default=4)
+        command_parser.add_argument(
+            "--delay", type=int, default=10, help="hundredths of a second per frame"
+        )
+    args = parser.parse_args()
+    if not args.gif and not args.ppm:
+        parser.error("give --gif, --ppm or both")
+
+    if args.command == "replay":
+        with open(args.file, "rb") as f:
+            data = Replay(f.read())
+    else:
+        data = Replay(
+            record_episode(
+                args.rows,
+                args.cols,
+                POLICIES[args.policy](seed=args.seed),
+                args.seed,
+                args.max_steps,
+                args.wrap,
+            )
+        )
+
+    writers = []
+    gif_file = None
+    if args.gif:
+        gif_file = open(args.gif, "wb")
+        writers.append(GIFWriter(gif_file, args.delay))
+    if args.ppm == "-":
+        writers.append(PPMWriter(sys.stdout.buffer))
+    elif args.ppm:
+        directory = os.path.dirname(args.ppm)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        writers.append(PPMWriter(args.ppm))
+    try:
+        frames = export_steps(replay_steps(data), writers, args.cell_pixels)
+    finally:
+        if gif_file is not None:
+            gif_file.close()
+    print(f"Frames: {frames}, points: {data.points}", file=sys.stderr)
+
+
+class FramesTest(unittest.TestCase):
+    def lzw_decode(self, data, min_code_size):
+        """Decodes GIF LZW data the way GIF readers do"""
+        clear_code = 1 << min_code_size
+        bits = int.from_bytes(data, "little")
+        position = 0
+        out = bytearray()
+        previous = None
+        while True:
+            if previous is None:
+                table = [bytes([i]) for i in range(clear_code)] + [None, None]
+                code_size = min_code_size + 1
+            code = (bits >> position) & ((1 << code_size) - 1)
+            position += code_size
+            if code == clear_code:
+                previous = None
+                continue
+            if code == clear_code + 1:
+                return bytes(out)
+            if previous is None:
+                entry = table[code]
+            else:
+                if code < len(table):
+                    entry = table[code]
+                else:
+                    entry = previous + previous[:1]
+                table.append(previous + entry[:1])
+                if len(table) == 1 << code_size and code_size < 12:
+                    code_size += 1
+            out += entry
+            previous = entry
+
+    def test_lzw_round_trip(self):
+        rng = random.Random(0)
+        # Long enough and random enough to fill the table of 4096 codes
+        noise = bytes(rng.randrange(4) for _ in range(40000))
+        for data in (bytes([1]), bytes(1000), noise):
+            self.assertEqual(self.lzw_decode(lzw_encode(data, 2), 2), data)
+
+    def test_export_replay(self):
+        data = Replay(record_episode(6, 8, POLICIES["random"](seed=1), 1, 200))
+        stream = io.BytesIO()
+        gif = io.BytesIO()
+        writers = [PPMWriter(stream), GIFWriter(gif, 5)]
+        frames = export_steps(replay_steps(data), writers, cell_pixels=2)
+        self.assertEqual(frames, data.num_steps + 1)
+        header = b"P6\n16 12\n255\n"
+        self.assertEqual(len(stream.getvalue()), frames * (len(header) + 16 * 12 * 3))
+        self.assertTrue(gif.getvalue().startswith(b"GIF89a"))
+        self.assertTrue(gif.getvalue().endswith(b";"))
+
+        # The last frame matches a fresh drawing of the final state
+        for model in replay_steps(data):
+            pass
+        renderer = FrameRenderer(6, 8, cell_pixels=2)
+        renderer.draw(model)
+        self.assertEqual(stream.getvalue()[-16 * 12 * 3 :], renderer.rgb)
+        head_row, head_col = model.snake_body[0]
+        self.assertEqual(renderer.indices[4 * head_row * 8 + 2 * head_col], 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Module: snake_headless
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Runs greedy snake without a window
+
+Builds a SnakeModel and advances it with one_step as fast as possible, asking a
+direction policy for the direction before every step. Never imports tkinter, so it
+runs on machines without a display.
+
+    python snake_headless.py --rows 30 --cols 30 --episodes 100 --policy random
+"""
+
+import argparse
+import random
+import time
+import unittest
+
+from snake_autopilot import AUTOPILOTS, is_safe
+from snake_model import DIRECTIONS, SnakeModel, VirtualClock
+
+
+class StraightPolicy:
+    """Policy that keeps the snake going in its current direction"""
+
+    def __init__(self, seed=None):
+        """initialize the policy, which makes no random choices so ignores seed"""
+
+    def __call__(self, model):
+        """returns the direction of the next step"""
+        return model.direction
+
+
+class RandomPolicy:
+    """Policy that turns at random, never back into the neck, and avoids the walls and
+    the body when it can"""
+
+    def __init__(self, seed=None, turn_chance=0.2):
+        """initialize the policy to turn on a turn_chance fraction of the steps"""
+        self.turn_chance = turn_chance
+        self.random = random.Random(seed)
+
+    def __call__(self, model):
+        """returns the direction of the next step"""
+        row_step, col_step = DIRECTIONS[model.direction]
+        choices = [
+            direction
+            for direction, step in DIRECTIONS.items()
+            if step != (-row_step, -col_step)
+        ]
+        safe_choices = [direction for direction in choices if is_safe(model, direction)]
+        if safe_choices:
+            choices = safe_choices
+        if model.direction in choices and self.random.random() >= self.turn_chance:
+            return model.direction
+        return self.random.choice(choices)
+
+
+# Policies selectable by name, each called with an optional seed to make a policy
+POLICIES = {"straight": StraightPolicy, "random": RandomPolicy, **AUTOPILOTS}
+
+
+def run_episode(model, policy, max_steps):
+    """Plays one game on model until it is over or max_steps steps have been taken,
+    and returns the number of steps taken"""
+    model.start_time = model.clock.time()
+    steps = 0
+    while steps < max_steps:
+        model.direction = policy(model)
+        steps += 1
+        if model.one_step() != "running":
+            break
+    return steps
+
+
+def run(num_rows, num_cols, policy, episodes, max_steps, seed=None, wrap=False):
+    """Plays episodes games on one model seeded with seed and timed by a VirtualClock,
+    and returns a dictionary with the totals and the steps and episodes per second"""
+    model = SnakeModel(num_rows, num_cols, random.Random(seed), VirtualClock())
+    model.wrap_status = wrap
+    total_steps = 0
+    total_points = 0
+    start = time.perf_counter()
+    for episode in range(episodes):
+        if episode > 0:
+            model.reset()
+        total_steps += run_episode(model, policy, max_steps)
+        total_points += model.points
+    seconds = time.perf_counter() - start
+    return {
+        "episodes": episodes,
+        "steps": total_steps,
+        "points": total_points,
+        "seconds": seconds,
+        "steps_per_sec": total_steps / seconds if seconds else 0.0,
+        "episodes_per_sec": episodes / seconds if seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run greedy snake without a window")
+    parser.add_argument("--rows", type=int, default=30)
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--max-steps", type=int, default=10000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--wrap", action="store_true", help="turn on wrap around mode")
+    args = parser.parse_args()
+
+    policy = POLICIES[args.policy](seed=args.seed)
+    results = run(
+        args.rows,
+        args.cols,
+        policy,
+        args.episodes,
+        args.max_steps,
+        args.seed,
+        args.wrap,
+    )
+    print(f"Episodes: {results['episodes']}")
+    print(f"Steps: {results['steps']}")
+    print(f"Points: {results['points']}")
+    print(f"Seconds: {results['seconds']:.2f}")
+    print(f"Steps per sec: {results['steps_per_sec']:.0f}")
+    print(f"Episodes per sec: {results['episodes_per_sec']:.1f}")
+    if hasattr(policy, "latency_report"):
+        print(policy.latency_report())
+
+
+class HeadlessTest(unittest.TestCase):
+    def test_seeded_run(self):
+        first, second = [
+            run(10, 10, RandomPolicy(seed=2), 5, 500, seed=2) for i in range(2)
+        ]
+        # The same seeds play the same games
+        self.assertEqual(
+            (first["steps"], first["points"]), (second["steps"], second["points"])
+        )
+        for stats in (first, second):
+            self.assertEqual(stats["episodes"], 5)
+            self.assertLessEqual(stats["steps"], 5 * 500)
+            self.assertGreater(stats["steps"], 5)
+            self.assertGreater(stats["steps_per_sec"], 0)
+            self.assertGreater(stats["episodes_per_sec"], 0)
+        # Going straight runs into a wall within a row, unless it wraps around
+        straight = run(10, 10, StraightPolicy(), 5, 20, seed=2)
+        self.assertLessEqual(straight["steps"], 5 * 10)
+        straight = run(10, 10, StraightPolicy(), 5, 20, seed=2, wrap=True)
+        self.assertEqual(straight["steps"], 5 * 20)
+
+    def test_run_episode(self):
+        model = SnakeModel(5, 5, random.Random(1), VirtualClock())
+        model.place_snake([(2, 0)], "East", food=(0, 0))
+        # Going straight east runs into the wall after four steps
+        self.assertEqual(run_episode(model, StraightPolicy(), 100), 5)
+        self.assertEqual((model.state, model.death_cause), ("game over", "wall"))
+        model.reset()
+        self.assertEqual(run_episode(model, POLICIES["bfs"](), 3), 3)
+        self.assertEqual(model.state, "running")
+
+    def test_random_policy_avoids_walls(self):
+        model = SnakeModel(5, 5, random.Random(1), VirtualClock())
+        model.place_snake([(0, 4)], "East", food=(4, 0))
+        policy = RandomPolicy(seed=0, turn_chance=0.0)
+        # North and East run into walls, and the policy never turns back West
+        self.assertEqual(
+            [is_safe(model, "North"), is_safe(model, "South")], [False, True]
+        )
+        for trial in range(20):
+            self.assertEqual(policy(model), "South")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Module: snake_metrics
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Rolling latency histograms for the game loop
+
+A RollingHistogram counts the most recent samples in logarithmic buckets, four to
+each doubling from one microsecond up to about a minute, so percentiles cost a walk
+over the buckets however many samples are kept. TickMetrics keeps one histogram for
+each part of a tick, and writes their percentiles to a CSV or JSON file.
+"""
+
+import csv
+import json
+import math
+import os
+import tempfile
+import unittest
+from collections import deque
+
+# Lower bound of the first bucket, and number of buckets per doubling
+MIN_SECONDS = 1e-6
+BUCKETS_PER_DOUBLING = 4
+NUM_BUCKETS = 26 * BUCKETS_PER_DOUBLING
+
+# Parts of a tick that TickMetrics keeps a histogram of
+TICK_PARTS = ("model", "render", "lateness", "input")
+
+
+class RollingHistogram:
+    """Histogram of the last window samples, in seconds"""
+
+    def __init__(self, window=1000):
+        """initialize an empty histogram that keeps the last window samples"""
+        self.counts = [0] * NUM_BUCKETS
+        self.buckets = deque(maxlen=window)
+        self.total = 0
+
+    def __len__(self):
+        """returns the number of samples in the window"""
+        return len(self.buckets)
+
+    def add(self, seconds):
+        """adds a sample, dropping the oldest one if the window is full"""
+        if seconds <= MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = int(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_DOUBLING) + 1
+            bucket = min(bucket, NUM_BUCKETS - 1)
+        if len(self.buckets) == self.buckets.maxlen:
+            self.counts[self.buckets[0]] -= 1
+        self.buckets.append(bucket)
+        self.counts[bucket] += 1
+        self.total += 1
+
+    def percentile(self, fraction):
+        """returns the upper bound of the bucket holding the given fraction of the
+        samples in the window, or 0 if it is empty"""
+        if not self.buckets:
+            return 0.0
+        rank = max(1, math.ceil(fraction * len(self.buckets)))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return upper_bound(bucket)
+        return upper_bound(NUM_BUCKETS - 1)
+
+    def bucket_counts(self):
+        """returns a list of (upper bound, count) for the buckets that are not empty"""
+        return [
+            (upper_bound(bucket), count)
+            for bucket, count in enumerate(self.counts)
+            if count
+        ]
+
+
+def upper_bound(bucket):
+    """returns the largest number of seconds counted in bucket"""
+    return MIN_SECONDS * 2 ** (bucket / BUCKETS_PER_DOUBLING)
+
+
+class TickMetrics:
+    """Rolling histograms of the model time, render time and lateness of ticks, and
+    of the time from a key press to the render of the step that took it"""
+
+    def __init__(self, window=1000):
+        """initialize one histogram per part of a tick"""
+        self.histograms = {part: RollingHistogram(window) for part in TICK_PARTS}
+
+    def add(self, part, seconds):
+        """adds a sample to the histogram of part"""
+        self.histograms[part].add(seconds)
+
+    def summary(self):
+        """returns a dictionary of the sample count and p50, p90 and p99 in seconds of
+        each part"""
+        return {
+            part: {
+                "samples": len(histogram),
+                "p50": histogram.percentile(0.5),
+                "p90": histogram.percentile(0.9),
+                "p99": histogram.percentile(0.99),
+            }
+            for part, histogram in self.histograms.items()
+        }
+
+    def status(self):
+        """returns lines with the p50 and p99 of each part in milliseconds"""
+        return "\n".join(
+            f"{part.capitalize()} p50/p99: {histogram.percentile(0.5) * 1000:.2f}"
+            f"/{histogram.percentile(0.99) * 1000:.2f} ms"
+            for part, histogram in self.histograms.items()
+        )
+
+    def write(self, path):
+        """writes the summary to path, as JSON with the bucket counts if path ends
+        in .json and as CSV otherwise"""
+        summary = self.summary()
+        if path.endswith(".json"):
+            for part, histogram in self.histograms.items():
+                summary[part]["buckets"] = histogram.bucket_counts()
+            with open(path, "w") as file:
+                json.dump(summary, file, indent=2)
+        else:
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["part", "samples", "p50", "p90", "p99"])
+                for part, row in summary.items():
+                    writer.writerow(
+                        [part, row["samples"], row["p50"], row["p90"], row["p99"]]
+                    )
+
+
+class TickMetricsTest(unittest.TestCase):
+    def test_percentiles_follow_window(self):
+        histogram = RollingHistogram(window=100)
+        self.assertEqual(histogram.percentile(0.5), 0.0)
+        for i in range(100):
+            histogram.add(0.001 if i < 90 else 0.1)
+        # Bucket bounds are within a quarter doubling of the sample
+        self.assertTrue(0.001 <= histogram.percentile(0.5) < 0.001 * 2**0.25)
+        self.assertTrue(0.1 <= histogram.percentile(0.99) < 0.1 * 2**0.25)
+        for i in range(100):
+            histogram.add(0.01)
+        self.assertEqual(len(histogram), 100)
+        self.assertEqual(histogram.total, 200)
+        self.assertEqual(len(histogram.bucket_counts()), 1)
+        self.assertTrue(0.01 <= histogram.percentile(0.99) < 0.01 * 2**0.25)
+
+    def test_write(self):
+        metrics = TickMetrics()
+        metrics.add("model", 0.0002)
+        metrics.add("render", 0.003)
+        self.assertIn("Model p50/p99: 0.2", metrics.status())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "latency.json")
+            metrics.write(path)
+            with open(path) as file:
+                summary = json.load(file)
+            self.assertEqual(summary["render"]["samples"], 1)
+            self.assertEqual(summary["lateness"]["buckets"], [])
+            path = os.path.join(directory, "latency.csv")
+            metrics.write(path)
+            with open(path) as file:
+                rows = list(csv.reader(file))
+            self.assertEqual([row[0] for row in rows[1:]], list(TICK_PARTS))
@@ -0,0 +1,807 @@
+"""
+Module: snake_model
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: The model of greedy snake (the class SnakeModel)
+
+Kept apart from the controller and the view in snake7 so that the game can be
+simulated without importing tkinter, for example by snake_headless.
+"""
+
+import copy
+import math
+import random
+import time
+import timeit
+import unittest
+from array import array
+from collections import deque, namedtuple
+from itertools import repeat
+from collections.abc import Sequence
+
+# Row and column offsets of one step in each direction
+DIRECTIONS = {"North": (-1, 0), "South": (1, 0), "East": (0, 1), "West": (0, -1)}
+
+# Directions in clockwise order, indexed by their two-bit direction code
+DIRECTION_CODES = ("North", "East", "South", "West")
+
+# Snapshots and clones copy the whole grid, rather than rebuild it from the body or
+# keep only the set of cells of the body, when it has at most this many cells per
+# segment of the body, since copying a cell in bulk is about this much faster than
+# setting one from Python. Either way they take time in proportion to the length of
+# the snake
+GRID_COPY_CELLS = 1024
+
+# Packed state of a SnakeModel, where body is an array of the row-major indices of the
+# cells of the snake from head to tail and direction is a direction code. The grid
+# holds exactly the cells of the body, so occupancy, the bytes of the occupancy grid,
+# and block_counts, the open cell counts of open_cells, are only kept when copying
+# them is as cheap as rebuilding them, and are None otherwise
+SnakeSnapshot = namedtuple(
+    "SnakeSnapshot",
+    [
+        "body",
+        "occupancy",
+        "block_counts",
+        "tail",
+        "food",
+        "direction",
+        "points",
+        "state",
+        "death_cause",
+        "wrap_status",
+        "elapsed_time",
+        "rng_state",
+    ],
+)
+
+
+class SnakeModel:
+    """This is the model"""
+
+    def __init__(self, num_rows, num_cols, rng=None, clock=None):
+        """initialize the model of the game, placing the snake and food with rng, a
+        random.Random which defaults to the random module, and timing the game with
+        clock, an object with a time() method in seconds which defaults to the time
+        module"""
+
+        # Size of grid
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+
+        # Sources of randomness and time
+        self.rng = rng if rng is not None else random
+        self.clock = clock if clock is not None else time
+
+        # Initialize open cells which is an index of (row, column) tuples
+        # Each tuple elemet specifies the row and column of each open cell on the grid
+        self.open_cells = FreeCells(self.num_rows, self.num_cols)
+
+        # Initialize snake body
+        self.body_segments = deque()
+        self.body_segments.append(self.rng.choice(self.open_cells))
+        self.open_cells.remove(self.body_segments[0])
+        self.snake_tail = self.body_segments[0]
+
+        # Initialize occupancy grid with one byte per cell in row-major order,
+        # 1 if the cell is taken by the snake body, kept up to date by open_cells
+        self.occupancy = self.open_cells.occupied
+
+        # Initialize food
+        self.current_food_location = self.rng.choice(self.open_cells)
+
+        # Initialize distance from walls
+        self.distance_list = []
+        distance_from_east = abs((self.num_cols - 1) - self.body_segments[0][1])
+        distance_from_west = abs(0 - self.body_segments[0][1])
+        distance_from_north = abs(0 - self.body_segments[0][0])
+        distance_from_south = abs((self.num_rows - 1) - self.body_segments[0][0])
+        self.distance_list = [
+            distance_from_east,
+            distance_from_west,
+            distance_from_north,
+            distance_from_south,
+        ]
+
+        # Initialize direction
+        self.direction = self.check_direction()
+
+        # Inialize points
+        self.points = 0
+
+        # Initialize time
+        self.start_time = 0
+        self.elapsed_time = 0
+        self.paused_time = 0
+        self.time_spent_paused = 0
+        self.unpaused_time = 0
+        self.resumed_time = 0
+
+        # Initialize wrap around mode status
+        self.wrap_status = False
+
+        # Initialize game status, which is "running", "game over" or "game won" once
+        # the snake fills the grid, and what ended the game: "wall" or "body"
+        self.state = "running"
+        self.death_cause = None
+
+        # Initialize the ((row, column), kind) cells changed by the last step, where
+        # kind is one of "head", "body", "open" or "food"
+        self.changed_cells = []
+
+    def one_step(self):
+        """simulates one time step to move the snake"""
+        if self.paused_time == 0:
+            self.elapsed_time = self.clock.time() - self.start_time
+        else:
+            now = self.clock.time()
+            self.elapsed_time = (now - self.start_time) - self.time_spent_paused
+        self.changed_cells = []
+        self.check_game_over()
+        if self.state == "running":
+            self.move_snake()
+            self.check_food()
+        return self.state
+
+    @property
+    def snake_body(self):
+        """read-only view of the snake body, starting at the head"""
+        return SnakeBody(self.body_segments)
+
+    def move_snake(self):
+        """moves the snake in a given direction North, South, West or East"""
+        head = self.next_head()
+        self.changed_cells.append((self.body_segments[0], "body"))
+        self.update_body(head)
+        self.open_cells.remove(head)
+        self.changed_cells.append((head, "head"))
+
+    def next_head(self, direction=None):
+        """returns the cell the snake head moves into in the given direction, which
+        defaults to its current direction, wrapped around the grid in wrap around mode,
+        or None if it would leave the grid"""
+        row_step, col_step = DIRECTIONS[direction or self.direction]
+        row = self.body_segments[0][0] + row_step
+        col = self.body_segments[0][1] + col_step
+        if self.wrap_status:
+            return (row % self.num_rows, col % self.num_cols)
+        if 0 <= row < self.num_rows and 0 <= col < self.num_cols:
+            return (row, col)
+        return None
+
+    def update_body(self, head):
+        """pushes the new snake head and lets the tail follow the body"""
+        self.body_segments.appendleft(head)
+        self.snake_tail = self.body_segments.pop()
+
+    def check_distance(self):
+        """checks distance from each border direction"""
+        self.distance_list = []
+        distance_from_east = abs((self.num_cols - 1) - self.body_segments[0][1])
+        distance_from_west = abs(0 - self.body_segments[0][1])
+        distance_from_north = abs(0 - self.body_segments[0][0])
+        distance_from_south = abs((self.num_rows - 1) - self.body_segments[0][0])
+        self.distance_list = [
+            distance_from_east,
+            distance_from_west,
+            distance_from_north,
+            distance_from_south,
+        ]
+
+    def check_game_over(self):
+        """checks if the user makes the game terminate"""
+        head = self.next_head()
+        # check if snake head hits a boundary
+        if head is None:
+            self.state = "game over"
+            self.death_cause = "wall"
+        # check if snake head hits snake body
+        elif self.occupancy[head[0] * self.num_cols + head[1]]:
+            self.state = "game over"
+            self.death_cause = "body"
+
+    def check_food(self):
+        """checks if the snake eats the food"""
+        if self.body_segments[0] == self.current_food_location:
+            self.body_segments.append(self.snake_tail)
+            self.points += 1
+            if self.open_cells:
+                self.current_food_location = self.rng.choice(self.open_cells)
+                self.changed_cells.append((self.current_food_location, "food"))
+            else:
+                # The snake fills the whole grid, so there is nowhere left for food
+                self.current_food_location = None
+                self.state = "game won"
+        else:
+            self.open_cells.add(self.snake_tail)
+            self.changed_cells.append((self.snake_tail, "open"))
+
+    def check_open_cells(self):
+        """rebuilds the open cell index and the occupancy grid from the snake body"""
+        self.open_cells = FreeCells(self.num_rows, self.num_cols, self.body_segments)
+        self.occupancy = self.open_cells.occupied
+
+    def check_direction(self):
+        """helper function that returns the furthest direction that the snake head is away from"""
+        self.check_distance()
+        direction = max(self.distance_list)
+        if direction == self.distance_list[0]:
+            direction = "East"
+        elif direction == self.distance_list[1]:
+            direction = "West"
+        elif direction == self.distance_list[2]:
+            direction = "North"
+        else:
+            direction = "South"
+        return direction
+
+    def place_snake(self, body, direction=None, food=None):
+        """puts the snake on the given (row, column) cells, head first, heading in
+        direction, and the food on food or else on a random open cell"""
+        self.body_segments = deque(body)
+        self.snake_tail = self.body_segments[-1]
+        self.check_open_cells()
+        if direction is not None:
+            self.direction = direction
+        if food is None:
+            food = self.rng.choice(self.open_cells)
+        self.current_food_location = food
+
+    def body_indices(self):
+        """returns an array of the row-major indices of the snake body, head first"""
+        num_cols = self.num_cols
+        return array("i", [r * num_cols + c for r, c in self.body_segments])
+
+    def grid_is_small(self):
+        """checks if the whole grid is kept and has at most GRID_COPY_CELLS cells per
+        body segment"""
+        return isinstance(
+            self.open_cells, FreeCells
+        ) and self.open_cells.size <= GRID_COPY_CELLS * len(self.body_segments)
+
+    def snapshot(self):
+        """returns the state of the game as a SnakeSnapshot"""
+        small = self.grid_is_small()
+        return SnakeSnapshot(
+            self.body_indices(),
+            bytes(self.occupancy) if small else None,
+            tuple(self.open_cells.block_counts) if small else None,
+            self.snake_tail,
+            self.current_food_location,
+            DIRECTION_CODES.index(self.direction),
+            self.points,
+            self.state,
+            self.death_cause,
+            self.wrap_status,
+            self.elapsed_time,
+            self.rng.getstate(),
+        )
+
+    def restore(self, snapshot):
+        """puts the game back in the state of a SnakeSnapshot taken on a grid of the
+        same size, copying its grid if it has one and otherwise opening the cells of
+        the current body and taking those of the snapshot"""
+        if snapshot.occupancy is None:
+            self.open_cells.open_indices(self.body_indices())
+            self.open_cells.take_indices(snapshot.body)
+        else:
+            self.occupancy[:] = snapshot.occupancy
+            self.open_cells.block_counts[:] = snapshot.block_counts
+            self.open_cells.count = self.open_cells.size - len(snapshot.body)
+        self.body_segments = deque(map(divmod, snapshot.body, repeat(self.num_cols)))
+        self.snake_tail = snapshot.tail
+        self.current_food_location = snapshot.food
+        self.direction = DIRECTION_CODES[snapshot.direction]
+        self.points = snapshot.points
+        self.state = snapshot.state
+        self.death_cause = snapshot.death_cause
+        self.wrap_status = snapshot.wrap_status
+        self.elapsed_time = snapshot.elapsed_time
+        self.rng.setstate(snapshot.rng_state)
+        self.changed_cells = []
+
+    def clone(self, rng=None, clock=None):
+        """returns an independent copy of the game, using rng for its random choices or
+        else a copy of the random state, and clock for its time or else a copy of the
+        clock unless it is the time module. On a grid much larger than the snake, the
+        copy only keeps the set of cells of the body, so that it takes the same time
+        however large the grid"""
+        clone = SnakeModel.__new__(SnakeModel)
+        clone.__dict__.update(self.__dict__)
+        if rng is None:
+            # Skip seeding a generator whose state is about to be overwritten
+            rng = random.Random.__new__(random.Random)
+            rng.setstate(self.rng.getstate())
+        clone.rng = rng
+        if clock is not None:
+            clone.clock = clock
+        elif self.clock is not time:
+            clone.clock = copy.copy(self.clock)
+        if self.grid_is_small():
+            clone.open_cells = self.open_cells.copy()
+        else:
+            clone.open_cells = SparseFreeCells(
+                self.num_rows, self.num_cols, self.body_indices()
+            )
+        clone.occupancy = clone.open_cells.occupied
+        clone.body_segments = self.body_segments.copy()
+        clone.distance_list = self.distance_list[:]
+        clone.changed_cells = []
+        return clone
+
+    def reset(self, seed=None):
+        """resets the game to its original state genreating the snake head, food,
+        and the remaining open cells, after reseeding rng with seed if given"""
+        if seed is not None:
+            self.rng.seed(seed)
+        self.body_segments = deque()
+        self.open_cells = FreeCells(self.num_rows, self.num_cols)
+        self.body_segments.append(self.rng.choice(self.open_cells))
+        self.check_open_cells()
+        self.current_food_location = self.rng.choice(self.open_cells)
+        self.direction = self.check_direction()
+        self.elapsed_time = 0.00
+        self.points = 0
+        self.time_spent_paused = 0
+        self.paused_time = 0
+        self.state = "running"
+        self.death_cause = None
+        self.changed_cells = []
+
+
+class VirtualClock:
+    """Clock that counts steps instead of reading the wall clock
+
+    SnakeModel reads its clock once per step, so each reading moves the virtual time
+    on by step_seconds and returns it. Runs timed by it are the same on every machine,
+    and never make a system call for the time."""
+
+    def __init__(self, step_seconds=1.0):
+        """initialize the clock at time 0"""
+        self.step_seconds = step_seconds
+        self.now = 0.0
+
+    def time(self):
+        """advances the virtual time by one step, and returns it in seconds"""
+        self.now += self.step_seconds
+        return self.now
+
+
+class InputQueue:
+    """Bounded queue of the directions asked for by the player, each with the time
+    it was asked for
+
+    Directions are queued instead of set on the model right away, so that two quick
+    turns within one step both happen, one step after the other. Each step takes at
+    most one turn from the queue, dropping directions that are not turns: the
+    current direction, and the reverse of it into the neck of the snake."""
+
+    def __init__(self, capacity=3, timer=time.perf_counter):
+        """initialize an empty queue of at most capacity directions, time stamped
+        by timer"""
+        self.capacity = capacity
+        self.timer = timer
+        self.inputs = deque()
+        self.dropped = 0
+
+    def __len__(self):
+        """returns the number of queued directions"""
+        return len(self.inputs)
+
+    def push(self, direction):
+        """queues direction with the time now, returning False and dropping it if
+        the queue is full"""
+        if len(self.inputs) >= self.capacity:
+            self.dropped += 1
+            return False
+        self.inputs.append((direction, self.timer()))
+        return True
+
+    def pop_turn(self, model):
+        """returns the first queued direction that turns the snake in model, and the
+        time it was queued, or None if there is none"""
+        while self.inputs:
+            direction, stamp = self.inputs.popleft()
+            if direction == model.direction:
+                continue
+            if len(model.body_segments) > 1:
+                if model.next_head(direction) == model.body_segments[1]:
+                    continue
+            return direction, stamp
+        return None
+
+    def clear(self):
+        """drops all queued directions"""
+        self.inputs.clear()
+
+
+class SnakeBody(Sequence):
+    """Read-only view of the (row, column) segments of the snake, head first"""
+
+    def __init__(self, segments):
+        """initialize the view over the deque of segments"""
+        self.segments = segments
+
+    def __len__(self):
+        """number of segments"""
+        return len(self.segments)
+
+    def __getitem__(self, index):
+        """returns the segment at index, or a list of segments for a slice"""
+        if isinstance(index, slice):
+            return list(self.segments)[index]
+        return self.segments[index]
+
+    def __iter__(self):
+        """iterates over the segments from head to tail"""
+        return iter(self.segments)
+
+    def __reversed__(self):
+        """iterates over the segments from tail to head"""
+        return reversed(self.segments)
+
+    def __repr__(self):
+        return f"SnakeBody({list(self.segments)!r})"
+
+
+class FreeCells:
+    """Index of the open cells on the grid
+
+    Reads like the row-major list of (row, column) tuples that check_open_cells used to
+    rebuild on every step, so rng.choice picks the same cell for the same seed. The
+    cells are split into blocks of about sqrt(num_rows * num_cols) cells with a count
+    of open cells in each, so adding and removing a cell is O(1) and finding the k-th
+    open cell is O(sqrt(num_rows * num_cols)). The flags of taken cells double as the
+    occupancy grid of SnakeModel"""
+
+    def __init__(self, num_rows, num_cols, occupied_cells=()):
+        """initialize the index with every cell open except occupied_cells"""
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.size = num_rows * num_cols
+
+        # One flag per cell in row-major order, 1 if the cell is taken
+        self.occupied = bytearray(self.size)
+        for r, c in occupied_cells:
+            self.occupied[r * num_cols + c] = 1
+        self.count = self.occupied.count(0)
+
+        # Number of open cells in each block
+        self.block_size = max(1, math.isqrt(self.size))
+        self.block_counts = [
+            self.occupied.count(0, i, i + self.block_size)
+            for i in range(0, self.size, self.block_size)
+        ]
+
+    def __len__(self):
+        """number of open cells"""
+        return self.count
+
+    def __getitem__(self, k):
+        """returns the k-th open cell in row-major order"""
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError("open cell index out of range")
+        block = 0
+        for count in self.block_counts:
+            if k < count:
+                break
+            k -= count
+            block += 1
+        i = self.occupied.find(0, block * self.block_size)
+        for skip in range(k):
+            i = self.occupied.find(0, i + 1)
+        return divmod(i, self.num_cols)
+
+    def __iter__(self):
+        """iterates over the open cells in row-major order"""
+        num_cols = self.num_cols
+        for i, flag in enumerate(self.occupied):
+            if not flag:
+                yield divmod(i, num_cols)
+
+    def __contains__(self, cell):
+        """checks if the (row, column) cell is open"""
+        r, c = cell
+        if 0 <= r < self.num_rows and 0 <= c < self.num_cols:
+            return self.occupied[r * self.num_cols + c] == 0
+        return False
+
+    def add(self, cell):
+        """marks the (row, column) cell as open"""
+        i = cell[0] * self.num_cols + cell[1]
+        if self.occupied[i]:
+            self.occupied[i] = 0
+            self.count += 1
+            self.block_counts[i // self.block_size] += 1
+
+    def remove(self, cell):
+        """marks the (row, column) cell as taken"""
+        i = cell[0] * self.num_cols + cell[1]
+        if not self.occupied[i]:
+            self.occupied[i] = 1
+            self.count -= 1
+            self.block_counts[i // self.block_size] -= 1
+
+    def open_indices(self, indices):
+        """marks the cells with the given row-major indices as open"""
+        occupied = self.occupied
+        block_counts = self.block_counts
+        block_size = self.block_size
+        for i in indices:
+            if occupied[i]:
+                occupied[i] = 0
+                self.count += 1
+                block_counts[i // block_size] += 1
+
+    def take_indices(self, indices):
+        """marks the cells with the given row-major indices as taken"""
+        occupied = self.occupied
+        block_counts = self.block_counts
+        block_size = self.block_size
+        for i in indices:
+            if not occupied[i]:
+                occupied[i] = 1
+                self.count -= 1
+                block_counts[i // block_size] -= 1
+
+    def copy(self):
+        """returns an independent copy of the index"""
+        copy = FreeCells.__new__(FreeCells)
+        copy.__dict__.update(self.__dict__)
+        copy.block_counts = self.block_counts[:]
+        copy.occupied = self.occupied[:]
+        return copy
+
+
+class TakenCells(set):
+    """Set of the row-major indices of the taken cells that reads like the occupancy
+    grid, where taken[i] is True if cell i is taken"""
+
+    __getitem__ = set.__contains__
+
+
+class SparseFreeCells:
+    """Index of the open cells on a grid with few taken cells
+
+    Reads like FreeCells but only keeps the set of taken cells, so it is built in time
+    in proportion to the taken cells however large the grid. Finding the k-th open cell
+    takes time in proportion to the taken cells. The set doubles as the occupancy grid
+    of SnakeModel"""
+
+    def __init__(self, num_rows, num_cols, taken=()):
+        """initialize the index with every cell open except the cells with the
+        row-major indices in taken"""
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.size = num_rows * num_cols
+        self.occupied = TakenCells(taken)
+        self.count = self.size - len(self.occupied)
+
+    def __len__(self):
+        """number of open cells"""
+        return self.count
+
+    def __getitem__(self, k):
+        """returns the k-th open cell in row-major order"""
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError("open cell index out of range")
+        # Each taken cell up to the answer moves it one cell further
+        i = k
+        for taken in sorted(self.occupied):
+            if taken > i:
+                break
+            i += 1
+        return divmod(i, self.num_cols)
+
+    def __iter__(self):
+        """iterates over the open cells in row-major order"""
+        occupied = self.occupied
+        num_cols = self.num_cols
+        for i in range(self.size):
+            if i not in occupied:
+                yield divmod(i, num_cols)
+
+    def __contains__(self, cell):
+        """checks if the (row, column) cell is open"""
+        r, c = cell
+        if 0 <= r < self.num_rows and 0 <= c < self.num_cols:
+            return r * self.num_cols + c not in self.occupied
+        return False
+
+    def add(self, cell):
+        """marks the (row, column) cell as open"""
+        self.occupied.discard(cell[0] * self.num_cols + cell[1])
+        self.count = self.size - len(self.occupied)
+
+    def remove(self, cell):
+        """marks the (row, column) cell as taken"""
+        self.occupied.add(cell[0] * self.num_cols + cell[1])
+        self.count = self.size - len(self.occupied)
+
+    def open_indices(self, indices):
+        """marks the cells with the given row-major indices as open"""
+        self.occupied.difference_update(indices)
+        self.count = self.size - len(self.occupied)
+
+    def take_indices(self, indices):
+        """marks the cells with the given row-major indices as taken"""
+        self.occupied.update(indices)
+        self.count = self.size - len(self.occupied)
+
+    def copy(self):
+        """returns an independent copy of the index"""
+        return SparseFreeCells(self.num_rows, self.num_cols, self.occupied)
+
+
+class SnakeModelTest(unittest.TestCase):
+    def setUp(self):
+        self.model = SnakeModel(5, 5)
+        self.model.place_snake([(0, 2)], food=(1, 2))
+        self.correct_direction = "South"
+        self.correct_tail_location = (0, 2)
+        self.correct_snake_length = 2
+        self.correct_game_over_state = "game over"
+
+    def test_initial_direction(self):
+        self.assertEqual(self.model.check_direction(), self.correct_direction)
+
+    def test_one_step(self):
+        self.model.direction = self.model.check_direction()
+        self.assertEqual(self.model.one_step(), "running")
+        self.assertEqual(self.model.snake_body[1], self.correct_tail_location)
+        self.assertEqual(len(self.model.snake_body), self.correct_snake_length)
+        self.assertEqual(self.model.points, 1)
+        self.assertNotIn(self.model.current_food_location, self.model.snake_body)
+
+    def test_hit_body(self):
+        self.model.direction = "South"
+        self.model.one_step()
+        self.model.direction = "North"
+        self.assertEqual(self.model.one_step(), self.correct_game_over_state)
+        self.assertEqual(self.model.death_cause, "body")
+        self.assertEqual(len(self.model.snake_body), self.correct_snake_length)
+
+    def test_hit_wall(self):
+        self.model.direction = "North"
+        self.assertEqual(self.model.one_step(), self.correct_game_over_state)
+        self.assertEqual(self.model.death_cause, "wall")
+
+    def test_wrap_around(self):
+        self.model.wrap_status = True
+        self.model.direction = "North"
+        self.assertEqual(self.model.one_step(), "running")
+        self.assertEqual(list(self.model.snake_body), [(4, 2)])
+
+    def test_open_cells(self):
+        self.model.direction = "South"
+        for step in range(3):
+            self.model.one_step()
+        self.model.direction = "East"
+        self.model.one_step()
+        body = set(self.model.snake_body)
+        cells = [(r, c) for r in range(5) for c in range(5)]
+        open_cells = [i for i in cells if i not in body]
+        self.assertEqual(list(self.model.open_cells), open_cells)
+        self.assertEqual(
+            [self.model.open_cells[k] for k in range(len(self.model.open_cells))],
+            list(self.model.open_cells),
+        )
+        self.assertEqual(
+            [r * 5 + c for r, c in cells if self.model.occupancy[r * 5 + c]],
+            sorted(r * 5 + c for r, c in body),
+        )
+
+    def test_seeded_replay(self):
+        models = [
+            SnakeModel(8, 8, random.Random(7), VirtualClock(0.5)) for i in range(2)
+        ]
+        for model in models:
+            for step in range(20):
+                model.direction = DIRECTION_CODES[step // 3 % 4]
+                model.one_step()
+        self.assertEqual(list(models[0].snake_body), list(models[1].snake_body))
+        self.assertEqual(
+            models[0].current_food_location, models[1].current_food_location
+        )
+        self.assertEqual(models[0].elapsed_time, 10.0)
+
+    def test_snapshot_restore_clone(self):
+        model = SnakeModel(8, 8, random.Random(3))
+        policy_random = random.Random(4)
+
+        def play(model, steps):
+            for step in range(steps):
+                model.direction = DIRECTION_CODES[policy_random.randrange(4)]
+                if model.one_step() != "running":
+                    break
+            return list(model.snake_body), model.current_food_location, model.state
+
+        play(model, 10)
+        snapshot = model.snapshot()
+        clone = model.clone()
+        policy_state = policy_random.getstate()
+        first = play(model, 40)
+        policy_random.setstate(policy_state)
+        self.assertEqual(play(clone, 40), first)
+        clock = VirtualClock()
+        self.assertIs(model.clone(clock=clock).clock, clock)
+        model.restore(snapshot)
+        policy_random.setstate(policy_state)
+        self.assertEqual(play(model, 40), first)
+        self.assertEqual(
+            [cell for cell in model.open_cells],
+            [(r, c) for r in range(8) for c in range(8) if (r, c) not in first[0]],
+        )
+
+    def test_sparse_snapshot(self):
+        # The grid is too large for the snapshot to keep a copy of it
+        model = SnakeModel(64, 64, random.Random(5))
+        model.wrap_status = True
+        model.place_snake([(5, 5), (5, 4)], "East", food=(5, 6))
+        snapshot = model.snapshot()
+        self.assertIsNone(snapshot.occupancy)
+        for step in range(70):
+            model.direction = "South" if step % 10 == 9 else "East"
+            model.one_step()
+        clone = model.clone()
+        self.assertIsInstance(clone.open_cells, SparseFreeCells)
+        body = list(model.snake_body)
+        model.restore(snapshot)
+        fresh = FreeCells(64, 64, [(5, 5), (5, 4)])
+        self.assertEqual(list(model.snake_body), [(5, 5), (5, 4)])
+        self.assertEqual(model.occupancy, fresh.occupied)
+        self.assertEqual(model.open_cells.block_counts, fresh.block_counts)
+        self.assertEqual(len(model.open_cells), fresh.count)
+
+        # The clone reads like a grid rebuilt from its body, and plays on the same
+        fresh = FreeCells(64, 64, body)
+        self.assertEqual(list(clone.snake_body), body)
+        self.assertEqual(
+            [bool(clone.occupancy[i]) for i in range(64 * 64)],
+            [bool(flag) for flag in fresh.occupied],
+        )
+        self.assertEqual(list(clone.open_cells), list(fresh))
+        self.assertEqual(len(clone.open_cells), fresh.count)
+        for k in (0, 300, 325, -1):
+            self.assertEqual(clone.open_cells[k], fresh[k])
+        twin = clone.clone()
+        twin.open_cells = FreeCells(64, 64, body)
+        twin.occupancy = twin.open_cells.occupied
+        for step in range(200):
+            for game in (clone, twin):
+                game.direction = "South" if step % 7 == 6 else "East"
+                game.one_step()
+            self.assertEqual(list(clone.snake_body), list(twin.snake_body))
+            self.assertEqual(clone.current_food_location, twin.current_food_location)
+        self.assertEqual(list(clone.open_cells), list(twin.open_cells))
+        restored = clone.snapshot()
+        self.assertIsNone(restored.occupancy)
+        clone.restore(snapshot)
+        self.assertEqual(len(clone.open_cells), fresh.size - 2)
+
+    def test_clone_time_is_flat(self):
+        # Cloning a short snake takes about as long on a large grid as on a small one
+        def clone_time(side):
+            model = SnakeModel(side, side, random.Random(1), VirtualClock())
+            return min(timeit.timeit(model.clone, number=200) for attempt in range(5))
+
+        self.assertLess(clone_time(1000), 3 * clone_time(40))
+
+    def test_input_queue(self):
+        self.model.direction = "South"
+        self.model.one_step()
+        inputs = InputQueue(capacity=3, timer=lambda: 1.5)
+        # Going back north runs into the neck, and south is no turn
+        for direction in ("North", "South", "East", "North", "West"):
+            inputs.push(direction)
+        self.assertEqual(inputs.dropped, 2)
+        self.assertEqual(inputs.pop_turn(self.model), ("East", 1.5))
+        self.model.direction = "East"
+        self.model.one_step()
+        self.assertEqual(inputs.pop_turn(self.model), None)
+        self.assertEqual(len(inputs), 0)
@@ -0,0 +1,261 @@
+"""
+Module: snake_replay
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Records games of greedy snake compactly and replays them at full speed
+
+A replay holds the seed of the game and the direction of every step as a two-bit
+direction code, four steps to a byte. Food placement is not stored, since it
+follows from the seed. The layout, in little-endian order, is
+
+    magic        4 bytes, b"SNKR"
+    version      1 byte
+    flags        1 byte, bit 0 set if wrap around mode was on at the start
+    num_rows     2 bytes
+    num_cols     2 bytes
+    seed         8 bytes
+    num_steps    4 bytes
+    points       4 bytes, at the end of the game
+    num_toggles  4 bytes
+    toggles      4 bytes per step at which wrap around mode was toggled
+    directions   (num_steps + 3) // 4 bytes
+
+    python snake_replay.py record --games 100 --dir replays
+    python snake_replay.py verify replays/*.replay
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import unittest
+
+from snake_headless import POLICIES, run_episode
+from snake_model import DIRECTION_CODES, SnakeModel, VirtualClock
+
+MAGIC = b"SNKR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHHQIII")
+WRAP_FLAG = 1
+
+# The four directions packed into each possible byte, in step order
+BYTE_DIRECTIONS = [
+    tuple(DIRECTION_CODES[(byte >> shift) & 3] for shift in (0, 2, 4, 6))
+    for byte in range(256)
+]
+
+
+class ReplayRecorder:
+    """Records the direction of every step of one game"""
+
+    def __init__(self, num_rows, num_cols, seed, wrap=False):
+        """initialize an empty recording of a game on a model seeded with seed"""
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.seed = seed
+        self.initial_wrap = wrap
+        self.wrap = wrap
+        self.num_steps = 0
+        self.toggles = []
+        self.directions = bytearray()
+
+    def record(self, direction, wrap=False):
+        """records the direction and wrap around mode of the next step"""
+        if wrap != self.wrap:
+            self.toggles.append(self.num_steps)
+            self.wrap = wrap
+        code = DIRECTION_CODES.index(direction)
+        if self.num_steps % 4 == 0:
+            self.directions.append(code)
+        else:
+            self.directions[-1] |= code << (self.num_steps % 4 * 2)
+        self.num_steps += 1
+
+    def to_bytes(self, points):
+        """returns the replay of the game, which ended with points"""
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            WRAP_FLAG if self.initial_wrap else 0,
+            self.num_rows,
+            self.num_cols,
+            self.seed,
+            self.num_steps,
+            points,
+            len(self.toggles),
+        )
+        toggles = struct.pack(f"<{len(self.toggles)}I", *self.toggles)
+        return header + toggles + bytes(self.directions)
+
+    def save(self, path, points):
+        """writes the replay of the game, which ended with points, to path"""
+        with open(path, "wb") as f:
+            f.write(self.to_bytes(points))
+
+
+class Replay:
+    """Header and direction codes of a recorded game"""
+
+    def __init__(self, data):
+        """initialize the replay from its bytes, or any buffer such as a memoryview"""
+        (
+            magic,
+            version,
+            flags,
+            self.num_rows,
+            self.num_cols,
+            self.seed,
+            self.num_steps,
+            self.points,
+            num_toggles,
+        ) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a snake replay")
+        self.wrap = bool(flags & WRAP_FLAG)
+        self.toggles = struct.unpack_from(f"<{num_toggles}I", data, HEADER.size)
+        start = HEADER.size + 4 * num_toggles
+        self.directions = memoryview(data)[start : start + (self.num_steps + 3) // 4]
+        self.size = start + len(self.directions)
+
+    def direction(self, step):
+        """returns the direction of the given step"""
+        if not 0 <= step < self.num_steps:
+            raise IndexError("step out of range")
+        return DIRECTION_CODES[(self.directions[step >> 2] >> (step % 4 * 2)) & 3]
+
+
+def replay(data, num_steps=None):
+    """Re-simulates the first num_steps steps, or all, of a replay given as bytes or a
+    Replay with no rendering, and returns the SnakeModel at the end"""
+    for model in replay_steps(data, num_steps):
+        pass
+    return model
+
+
+def replay_steps(data, num_steps=None):
+    """Re-simulates the first num_steps steps, or all, of a replay given as bytes or a
+    Replay, yielding the SnakeModel before the first step and after every step"""
+    if not isinstance(data, Replay):
+        data = Replay(data)
+    if num_steps is None:
+        num_steps = data.num_steps
+    model = SnakeModel(
+        data.num_rows, data.num_cols, random.Random(data.seed), VirtualClock()
+    )
+    model.wrap_status = data.wrap
+    yield model
+    toggles = set(data.toggles)
+    step = 0
+    for byte in data.directions:
+        for direction in BYTE_DIRECTIONS[byte]:
+            if step == num_steps:
+                return
+            if step in toggles:
+                model.wrap_status = not model.wrap_status
+            model.direction = direction
+            model.one_step()
+            step += 1
+            yield model
+
+
+def verify(data):
+    """checks if re-simulating a replay ends with the points it recorded"""
+    if not isinstance(data, Replay):
+        data = Replay(data)
+    return replay(data).points == data.points
+
+
+def record_episode(num_rows, num_cols, policy, seed, max_steps, wrap=False):
+    """Plays one headless game seeded with seed, and returns its replay as bytes"""
+    model = SnakeModel(num_rows, num_cols, random.Random(seed), VirtualClock())
+    model.wrap_status = wrap
+    recorder = ReplayRecorder(num_rows, num_cols, seed, wrap)
+
+    def recording_policy(model):
+        direction = policy(model)
+        recorder.record(direction, model.wrap_status)
+        return direction
+
+    run_episode(model, recording_policy, max_steps)
+    return recorder.to_bytes(model.points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and verify snake replays")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="record headless games")
+    record_parser.add_argument("--dir", required=True)
+    record_parser.add_argument("--games", type=int, default=100)
+    record_parser.add_argument("--first-seed", type=int, default=0)
+    record_parser.add_argument("--rows", type=int, default=30)
+    record_parser.add_argument("--cols", type=int, default=30)
+    record_parser.add_argument("--max-steps", type=int, default=10000)
+    record_parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    record_parser.add_argument("--wrap", action="store_true")
+    verify_parser = commands.add_parser("verify", help="re-simulate replay files")
+    verify_parser.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        os.makedirs(args.dir, exist_ok=True)
+        for seed in range(args.first_seed, args.first_seed + args.games):
+            data = record_episode(
+                args.rows,
+                args.cols,
+                POLICIES[args.policy](seed=seed),
+                seed,
+                args.max_steps,
+                args.wrap,
+            )
+            with open(os.path.join(args.dir, f"{seed}.replay"), "wb") as f:
+                f.write(data)
+        return
+
+    failures = 0
+    steps = 0
+    start = time.perf_counter()
+    for path in args.files:
+        with open(path, "rb") as f:
+            data = Replay(f.read())
+        steps += data.num_steps
+        if not verify(data):
+            failures += 1
+            print(f"Mismatch: {path}")
+    seconds = time.perf_counter() - start
+    print(f"Replays: {len(args.files)}, mismatches: {failures}")
+    print(f"Replays per hour: {len(args.files) / seconds * 3600:.0f}")
+    print(f"Steps per sec: {steps / seconds:.0f}")
+    sys.exit(1 if failures else 0)
+
+
+class ReplayTest(unittest.TestCase):
+    def test_round_trip(self):
+        for seed in range(20):
+            model = SnakeModel(7, 9, random.Random(seed), VirtualClock())
+            recorder = ReplayRecorder(7, 9, seed)
+            policy = POLICIES["random"](seed=seed)
+            for step in range(500):
+                if step % 50 == 25:
+                    model.wrap_status = not model.wrap_status
+                model.direction = policy(model)
+                recorder.record(model.direction, model.wrap_status)
+                if model.one_step() != "running":
+                    break
+            data = recorder.to_bytes(model.points)
+            size = HEADER.size + 4 * len(recorder.toggles)
+            size += (recorder.num_steps + 3) // 4
+            self.assertEqual(len(data), size)
+            replayed = replay(data)
+            self.assertTrue(verify(data))
+            self.assertEqual(list(replayed.snake_body), list(model.snake_body))
+            self.assertEqual(
+                replayed.current_food_location, model.current_food_location
+            )
+            self.assertEqual(replayed.state, model.state)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Module: snake_scheduler
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Fixed time step scheduler for the game loop
+
+Ticks are due at absolute deadlines start + n * interval on a monotonic clock, so
+the time spent computing and drawing a tick is taken out of the wait for the next
+one instead of being added to it. When the loop falls behind by more than a tick,
+the "skip" policy runs a single tick and drops the deadlines it missed, while the
+"catch-up" policy runs the missed ticks back to back, up to max_catch_up at a time.
+"""
+
+import math
+import time
+import unittest
+
+POLICIES = ("skip", "catch-up")
+
+
+class TickScheduler:
+    """Decides how many ticks are due and how long to wait for the next one"""
+
+    def __init__(self, interval, policy="skip", max_catch_up=5, clock=None):
+        """initialize a stopped scheduler that ticks every interval seconds, reading
+        the time from clock which defaults to time.monotonic"""
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        self.interval = interval
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.clock = time.monotonic if clock is None else clock
+        self.running = False
+        self.next_deadline = 0.0
+        self.started = 0.0
+        self.run_seconds = 0.0
+        self.ticks = 0
+        self.skipped = 0
+        self.late_seconds = 0.0
+        self.lateness = 0.0
+
+    def start(self):
+        """starts ticking, with the first tick due one interval from now"""
+        now = self.clock()
+        self.running = True
+        self.started = now
+        self.next_deadline = now + self.interval
+
+    def stop(self):
+        """stops ticking, so that time spent paused is left out of the tick rate"""
+        if self.running:
+            self.running = False
+            self.run_seconds += self.clock() - self.started
+
+    def set_interval(self, interval):
+        """changes the interval, moving the next deadline to one new interval after
+        the previous one"""
+        self.next_deadline += interval - self.interval
+        self.interval = interval
+
+    def due(self):
+        """returns the number of ticks to run now, and moves the next deadline past
+        them, keeping how late the first of them is in lateness"""
+        if not self.running:
+            return 0
+        lateness = self.clock() - self.next_deadline
+        if lateness < 0:
+            return 0
+        self.lateness = lateness
+        self.late_seconds += lateness
+        missed = int(lateness // self.interval)
+        if self.policy == "catch-up":
+            ticks = min(1 + missed, self.max_catch_up)
+        else:
+            ticks = 1
+        self.skipped += 1 + missed - ticks
+        self.next_deadline += (1 + missed) * self.interval
+        self.ticks += ticks
+        return ticks
+
+    def delay(self):
+        """returns the number of whole milliseconds until the next deadline"""
+        # Rounding first keeps float error from adding a millisecond
+        millis = round((self.next_deadline - self.clock()) * 1000, 6)
+        return max(0, math.ceil(millis))
+
+    def achieved_rate(self):
+        """returns the number of ticks run per second while running"""
+        seconds = self.run_seconds
+        if self.running:
+            seconds += self.clock() - self.started
+        return self.ticks / seconds if seconds > 0 else 0.0
+
+    def requested_rate(self):
+        """returns the number of ticks per second asked for"""
+        return 1 / self.interval
+
+    def report(self):
+        """returns a line with the requested and achieved tick rates"""
+        mean_lateness = self.late_seconds / self.ticks if self.ticks else 0.0
+        return (
+            f"Ticks: {self.ticks}, requested: {self.requested_rate():.2f}/s,"
+            f" achieved: {self.achieved_rate():.2f}/s, skipped: {self.skipped},"
+            f" mean lateness: {mean_lateness * 1000:.1f} ms"
+        )
+
+
+class TickSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.clock = lambda: self.now
+
+    def test_deadlines_do_not_drift(self):
+        scheduler = TickScheduler(0.1, clock=self.clock)
+        scheduler.start()
+        self.assertEqual(scheduler.delay(), 100)
+        for tick in range(1, 11):
+            # Each tick wakes up 30 ms late, which the next wait makes up for
+            self.now = tick * 0.1 + 0.03
+            self.assertEqual(scheduler.due(), 1)
+            self.assertEqual(scheduler.delay(), 70)
+        self.assertAlmostEqual(scheduler.next_deadline, 1.1)
+        self.assertAlmostEqual(scheduler.achieved_rate(), 10 / 1.03)
+
+    def test_skip_and_catch_up(self):
+        skip = TickScheduler(0.1, clock=self.clock)
+        catch_up = TickScheduler(0.1, "catch-up", max_catch_up=3, clock=self.clock)
+        skip.start()
+        catch_up.start()
+        self.now = 0.45
+        self.assertEqual(skip.due(), 1)
+        self.assertEqual(skip.skipped, 3)
+        self.assertEqual(catch_up.due(), 3)
+        self.assertEqual(catch_up.skipped, 1)
+        for scheduler in (skip, catch_up):
+            self.assertEqual(scheduler.due(), 0)
+            self.assertEqual(scheduler.delay(), 50)
+
+    def test_pause_and_interval_change(self):
+        scheduler = TickScheduler(0.1, clock=self.clock)
+        scheduler.start()
+        self.now = 0.1
+        scheduler.due()
+        scheduler.stop()
+        self.now = 5.0
+        self.assertEqual(scheduler.due(), 0)
+        scheduler.start()
+        scheduler.set_interval(0.05)
+        self.assertEqual(scheduler.delay(), 50)
+        self.now = 5.05
+        self.assertEqual(scheduler.due(), 1)
+        self.assertAlmostEqual(scheduler.achieved_rate(), 2 / 0.15)
+        self.assertRaises(ValueError, TickScheduler, 0.1, "rewind")
@@ -0,0 +1,523 @@
+"""
+Module: snake_server
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Hosts many games of greedy snake in one asyncio event loop
+
+Each TCP connection plays its own SnakeModel, stepped on its own fixed time step.
+Rather than a task or timer per game, the server keeps one heap of the games
+ordered by the deadline of their next step and one timer for the earliest
+deadline, so a step costs a heap operation whatever the number of games. Turns
+from the player go through an InputQueue, so each step applies at most one.
+
+The protocol is one line of text per message. The client sends
+
+    North, East, South or West    queue a turn
+    WRAP on or WRAP off           toggle wrap around mode
+    NEW                           start a new game
+    STATS                         ask for the statistics of the server
+    WATCH <game>                  stop playing and watch the game numbered game
+
+and the server sends
+
+    GAME <rows> <cols> <seed>                     a new game started
+    STEP <step> <points> <row>,<col>,<kind> ...   the cells a step changed
+    END <state> <points>                          the game ended
+    STATS <name>=<value> ...                      statistics of the server
+    ERR <message>                                 the line was not understood
+    WATCH <game>                                  spectating starts
+
+A line that is not UTF-8 or is longer than 64 KiB gets an ERR and the connection is
+closed.
+
+After WATCH the connection receives the binary stream of snake_broadcast, encoded
+once per step of the watched game for all of its spectators, until it disconnects.
+
+A load generator is bundled, which starts a server and plays many random games
+against it to measure how many games one core can host and how evenly steps
+arrive:
+
+    python snake_server.py serve --port 8765
+    python snake_server.py load --clients 100 1000 --seconds 10
+"""
+
+import argparse
+import asyncio
+import heapq
+import random
+import subprocess
+import sys
+import time
+import unittest
+
+from snake_broadcast import Broadcaster, Spectator, read_varint
+from snake_metrics import RollingHistogram
+from snake_model import DIRECTION_CODES, InputQueue, SnakeModel, VirtualClock
+from snake_scheduler import TickScheduler
+
+
+class ServerGame:
+    """One game of the server, played over one connection"""
+
+    def __init__(self, number, writer, step_seconds, clock):
+        """initialize a game that is started with GameServer.new_game"""
+        self.number = number
+        self.writer = writer
+        self.step_seconds = step_seconds
+        self.model = None
+        self.seed = None
+        self.inputs = InputQueue(timer=clock)
+        self.scheduler = TickScheduler(step_seconds, clock=clock)
+        self.steps = 0
+        self.closed = False
+        self.broadcaster = Broadcaster()
+        self.watching = None
+        self.receive_frame = None
+        self.spectators = []
+
+    def send(self, line):
+        """writes line to the client, without waiting for it to be sent"""
+        self.writer.write(line.encode() + b"\n")
+
+
+class GameServer:
+    """Server of games of num_rows by num_cols cells stepped every step_seconds"""
+
+    def __init__(self, num_rows=30, num_cols=30, step_seconds=0.1, max_buffer=65536):
+        """initialize a server with no games, which drops clients that leave more than
+        max_buffer bytes unread"""
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.step_seconds = step_seconds
+        self.max_buffer = max_buffer
+        self.games = 0
+        self.clients = {}
+        self.playing = 0
+        self.spectators = 0
+        self.steps = 0
+        self.heap = []
+        self.timer = None
+        self.timer_deadline = None
+        self.lateness = RollingHistogram(window=10000)
+        self.loop = None
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        """starts listening on host and port, and returns the port"""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle_client(self, reader, writer):
+        """plays games with one client until it disconnects"""
+        self.games += 1
+        game = ServerGame(self.games, writer, self.step_seconds, self.loop.time)
+        self.clients[game.number] = game
+        self.playing += 1
+        self.new_game(game)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.handle_line(game, line.decode().strip())
+        except (UnicodeDecodeError, ValueError):
+            # The line was not UTF-8, or was longer than the limit of the reader
+            if game.watching is None:
+                game.send("ERR line is not UTF-8 text of at most 64 KiB")
+        except ConnectionError:
+            pass
+        finally:
+            game.closed = True
+            del self.clients[game.number]
+            if game.watching is None:
+                self.playing -= 1
+            else:
+                self.stop_watching(game)
+            # The spectators of the game have nothing left to watch
+            for spectator in game.spectators:
+                spectator.closed = True
+                spectator.writer.close()
+            writer.close()
+
+    def handle_line(self, game, line):
+        """carries out one line sent by the client"""
+        if game.watching is not None:
+            return
+        if line in DIRECTION_CODES:
+            game.inputs.push(line)
+        elif line in ("WRAP on", "WRAP off"):
+            game.model.wrap_status = line == "WRAP on"
+        elif line == "NEW":
+            if game.model.state == "running":
+                game.send(f"END {game.model.state} {game.model.points}")
+            self.new_game(game)
+        elif line == "STATS":
+            game.send(self.stats())
+        elif line.startswith("WATCH "):
+            self.watch(game, line[len("WATCH ") :])
+        else:
+            game.send(f"ERR unknown command {line!r}")
+
+    def new_game(self, game):
+        """starts a new game for the connection of game, and schedules its steps"""
+        game.seed = random.getrandbits(64)
+        game.model = SnakeModel(
+            self.num_rows,
+            self.num_cols,
+            random.Random(game.seed),
+            VirtualClock(self.step_seconds),
+        )
+        game.inputs.clear()
+        game.broadcaster.restart()
+        game.send(f"GAME {self.num_rows} {self.num_cols} {game.seed}")
+        if not game.scheduler.running:
+            game.scheduler.start()
+            self.schedule(game)
+
+    def watch(self, game, number):
+        """ends the game of the connection of game and subscribes it to the spectator
+        stream of the game numbered number"""
+        watched = self.clients.get(int(number)) if number.isdigit() else None
+        if watched is None or watched is game or watched.watching is not None:
+            game.send(f"ERR no game {number!r} to watch")
+            return
+        if game.model.state == "running":
+            game.send(f"END {game.model.state} {game.model.points}")
+        game.send(f"WATCH {watched.number}")
+        # The game leaves the heap at its next deadline
+        game.watching = watched
+        game.receive_frame = lambda message: self.send_frame(game, message)
+        watched.broadcaster.subscribe(game.receive_frame)
+        watched.spectators.append(game)
+        self.playing -= 1
+        self.spectators += 1
+
+    def stop_watching(self, game):
+        """unsubscribes the connection of game from the game it watches"""
+        watched = game.watching
+        watched.broadcaster.unsubscribe(game.receive_frame)
+        watched.spectators.remove(game)
+        game.watching = None
+        game.receive_frame = None
+        self.spectators -= 1
+
+    def send_frame(self, game, message):
+        """writes one message of the spectator stream to the connection of game"""
+        if game.closed:
+            return
+        game.writer.write(message)
+        if game.writer.transport.get_write_buffer_size() > self.max_buffer:
+            game.closed = True
+            game.writer.close()
+
+    def schedule(self, game):
+        """puts game on the heap at the deadline of its next step"""
+        heapq.heappush(self.heap, (game.scheduler.next_deadline, game.number, game))
+        # The timer is for the earliest deadline on the heap, not just this one
+        deadline = self.heap[0][0]
+        if self.timer_deadline is None or deadline < self.timer_deadline:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = self.loop.call_at(deadline, self.run_due_steps)
+            self.timer_deadline = deadline
+
+    def run_due_steps(self):
+        """steps every game whose deadline has come, and sets the timer for the next"""
+        self.timer = None
+        self.timer_deadline = None
+        now = self.loop.time()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[2])
+        for game in due:
+            if game.closed or game.watching is not None:
+                game.scheduler.stop()
+                continue
+            ticks = game.scheduler.due()
+            if ticks:
+                self.lateness.add(game.scheduler.lateness)
+            for _ in range(ticks):
+                self.step(game)
+                if game.closed or game.model.state != "running":
+                    break
+            if game.closed:
+                game.scheduler.stop()
+            elif game.model.state != "running":
+                # The game waits for NEW, which puts it back on the heap
+                game.scheduler.stop()
+            else:
+                self.schedule(game)
+        if self.heap and self.timer is None:
+            self.timer_deadline = self.heap[0][0]
+            self.timer = self.loop.call_at(self.timer_deadline, self.run_due_steps)
+
+    def step(self, game):
+        """steps the model of game and sends the cells that changed"""
+        model = game.model
+        turn = game.inputs.pop_turn(model)
+        if turn is not None:
+            model.direction = turn[0]
+        state = model.one_step()
+        game.steps += 1
+        self.steps += 1
+        game.broadcaster.publish(model, game.steps)
+        if state == "running":
+            cells = " ".join(
+                f"{row},{col},{kind}" for (row, col), kind in model.changed_cells
+            )
+            game.send(f"STEP {game.steps} {model.points} {cells}")
+        else:
+            game.send(f"END {state} {model.points}")
+        if game.writer.transport.get_write_buffer_size() > self.max_buffer:
+            # The client is not reading, so stop playing for it
+            game.closed = True
+            game.writer.close()
+
+    def stats(self):
+        """returns the STATS line, with the lateness of steps in milliseconds"""
+        return (
+            f"STATS games={self.games} playing={self.playing} steps={self.steps}"
+            f" spectators={self.spectators}"
+            f" cpu={time.process_time():.3f}"
+            f" lateness_p50={self.lateness.percentile(0.5) * 1000:.3f}"
+            f" lateness_p99={self.lateness.percentile(0.99) * 1000:.3f}"
+        )
+
+
+async def serve(host, port, num_rows, num_cols, step_seconds):
+    """runs a server until it is interrupted, printing the port it listens on"""
+    server = GameServer(num_rows, num_cols, step_seconds)
+    port = await server.start(host, port)
+    print(f"Listening on {host}:{port}", flush=True)
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def parse_stats(line):
+    """returns the values of a STATS line as a dictionary of floats"""
+    return {
+        name: float(value)
+        for name, value in (field.split("=") for field in line.split()[1:])
+    }
+
+
+async def read_frame(reader):
+    """returns the next message of a spectator stream, without its length"""
+    header = bytearray()
+    while not header or header[-1] >= 0x80:
+        header += await reader.readexactly(1)
+    length, _ = read_varint(header, 0)
+    return await reader.readexactly(length)
+
+
+async def play_randomly(host, port, seconds, step_seconds, jitter, counts):
+    """plays random games in wrap around mode for seconds, adding how far the time
+    between steps strays from step_seconds to the jitter histogram"""
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random()
+    writer.write(b"WRAP on\n")
+    end = time.monotonic() + seconds
+    last = None
+    while time.monotonic() < end:
+        line = await reader.readline()
+        if not line:
+            break
+        now = time.monotonic()
+        if line.startswith(b"STEP"):
+            counts[0] += 1
+            if last is not None:
+                jitter.add(abs(now - last - step_seconds))
+            last = now
+            if rng.random() < 0.1:
+                writer.write(rng.choice(DIRECTION_CODES).encode() + b"\n")
+        elif line.startswith(b"END"):
+            last = None
+            writer.write(b"NEW\nWRAP on\n")
+    writer.close()
+
+
+async def ask_stats(host, port):
+    """returns the statistics of the server at host and port"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"STATS\n")
+    while True:
+        line = (await reader.readline()).decode()
+        if line.startswith("STATS"):
+            writer.close()
+            return parse_stats(line)
+
+
+async def load(host, port, num_clients, seconds, step_seconds):
+    """plays num_clients games at once against the server for seconds, and returns
+    the steps the clients received, the steps per second of server CPU time, and the
+    median and 99th percentile of the client jitter and server lateness in seconds"""
+    jitter = RollingHistogram(window=100000)
+    counts = [0]
+    before = await ask_stats(host, port)
+    await asyncio.gather(
+        *(
+            play_randomly(host, port, seconds, step_seconds, jitter, counts)
+            for _ in range(num_clients)
+        )
+    )
+    after = await ask_stats(host, port)
+    cpu = after["cpu"] - before["cpu"]
+    steps = after["steps"] - before["steps"]
+    return (
+        counts[0],
+        steps / cpu if cpu else 0.0,
+        jitter.percentile(0.5),
+        jitter.percentile(0.99),
+        after["lateness_p50"] / 1000,
+        after["lateness_p99"] / 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host games of snake over TCP")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run a game server")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    load_parser = commands.add_parser("load", help="measure a local game server")
+    load_parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 1000])
+    load_parser.add_argument("--seconds", type=float, default=10)
+    for command_parser in (serve_parser, load_parser):
+        command_parser.add_argument("--rows", type=int, default=30)
+        command_parser.add_argument("--cols", type=int, default=30)
+        command_parser.add_argument("--step-ms", type=int, default=100)
+    args = parser.parse_args()
+    step_seconds = args.step_ms / 1000
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.rows, args.cols, step_seconds))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Run the server in its own process, so that its CPU time is its own
+    server = subprocess.Popen(
+        [sys.executable, __file__, "serve", "--port", "0"]
+        + ["--rows", str(args.rows), "--cols", str(args.cols)]
+        + ["--step-ms", str(args.step_ms)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        host, port = server.stdout.readline().split()[-1].rsplit(":", 1)
+        print(
+            f"{'clients':>8} {'steps':>9} {'games/core':>11} {'jitter p50':>11}"
+            f" {'jitter p99':>11} {'late p50':>9} {'late p99':>9}"
+        )
+        for num_clients in args.clients:
+            steps, rate, jitter_50, jitter_99, late_50, late_99 = asyncio.run(
+                load(host, int(port), num_clients, args.seconds, step_seconds)
+            )
+            # Games one core could step on time, from the steps per CPU second
+            games_per_core = rate * step_seconds
+            print(
+                f"{num_clients:>8} {steps:>9} {games_per_core:>11.0f}"
+                f" {jitter_50 * 1000:>9.2f}ms {jitter_99 * 1000:>9.2f}ms"
+                f" {late_50 * 1000:>7.2f}ms {late_99 * 1000:>7.2f}ms"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+class GameServerTest(unittest.TestCase):
+    def test_play(self):
+        async def play():
+            server = GameServer(10, 10, step_seconds=0.01)
+            port = await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            lines = [(await reader.readline()).decode().split()]
+            writer.write(b"WRAP on\nSTATS\nJump\n")
+            while len(lines) < 12:
+                lines.append((await reader.readline()).decode().split())
+            writer.close()
+            server.server.close()
+            await server.server.wait_closed()
+            return server, lines
+
+        server, lines = asyncio.run(play())
+        self.assertEqual(lines[0][:3], ["GAME", "10", "10"])
+        self.assertIn("ERR", [line[0] for line in lines])
+        stats = [line for line in lines if line[0] == "STATS"][0]
+        self.assertEqual(parse_stats(" ".join(stats))["games"], 1)
+        steps = [line for line in lines if line[0] == "STEP"]
+        # Wrap around mode keeps the snake alive while it goes straight
+        self.assertEqual([int(line[1]) for line in steps], list(range(1, 10)))
+        self.assertTrue(all(",head" in " ".join(line) for line in steps))
+        self.assertGreaterEqual(server.steps, 9)
+
+    def test_watch(self):
+        async def watch():
+            server = GameServer(10, 10, step_seconds=0.01)
+            port = await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            await reader.readline()
+            writer.write(b"WRAP on\n")
+            watch_reader, watch_writer = await asyncio.open_connection(
+                "127.0.0.1", port
+            )
+            watch_writer.write(b"WATCH 7\nWATCH 1\n")
+            lines = []
+            while not lines or lines[-1][0] != "WATCH":
+                lines.append((await watch_reader.readline()).decode().split())
+            spectator = Spectator()
+            while spectator.step < 10:
+                spectator.apply(await read_frame(watch_reader))
+            # The player was sent the same step as a line
+            line = []
+            while line[:2] != ["STEP", str(spectator.step)]:
+                line = (await reader.readline()).decode().split()
+            head = [cell for cell in line[3:] if cell.endswith(",head")]
+            stats = server.stats()
+            # The spectator is disconnected when the player leaves
+            writer.close()
+            await asyncio.wait_for(watch_reader.read(), 5)
+            await asyncio.sleep(0.05)
+            watch_writer.close()
+            self.assertEqual((server.spectators, server.clients), (0, {}))
+            server.server.close()
+            await server.server.wait_closed()
+            return lines, spectator, head, stats
+
+        lines, spectator, head, stats = asyncio.run(watch())
+        self.assertIn(["ERR", "no", "game", "'7'", "to", "watch"], lines)
+        self.assertEqual(lines[-1], ["WATCH", "1"])
+        self.assertEqual((spectator.num_rows, spectator.num_cols), (10, 10))
+        self.assertEqual(spectator.state, "running")
+        self.assertEqual(head, ["{},{},head".format(*spectator.body[0])])
+        self.assertEqual(parse_stats(stats)["spectators"], 1)
+
+    def test_bad_input(self):
+        async def send_bad_lines():
+            server = GameServer(10, 10, step_seconds=0.01)
+            port = await server.start()
+            replies = []
+            for data in (b"\xff\xfeNorth\n", b"x" * 70000 + b"\n"):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                await reader.readline()
+                writer.write(data)
+                lines = (await asyncio.wait_for(reader.read(), 5)).splitlines()
+                replies.append([line for line in lines if line.startswith(b"ERR")])
+                writer.close()
+            await asyncio.sleep(0.05)
+            server.server.close()
+            await server.server.wait_closed()
+            return server, replies
+
+        server, replies = asyncio.run(send_bad_lines())
+        for lines in replies:
+            # The connection is closed after one ERR
+            self.assertEqual(lines, [b"ERR line is not UTF-8 text of at most 64 KiB"])
+        self.assertEqual((server.playing, server.clients), (0, {}))
+
+
+if __name__ == "__main__":
+    main()
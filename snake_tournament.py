@@ -0,0 +1,184 @@
+"""
+Module: snake_tournament
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Scores a policy over many seeded games on all cores
+
+Shards the episode seeds into chunks and plays each chunk in a worker process of a
+ProcessPoolExecutor. Every worker drives a headless SnakeModel and sends back one
+compact (seed, points, steps, death cause) tuple per episode, which the aggregator
+takes in as each chunk finishes.
+
+    python snake_tournament.py --episodes 20000 --policy random --chunk-size 200
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from snake_headless import POLICIES, run_episode
+from snake_model import SnakeModel, VirtualClock
+
+
+def play_episodes(num_rows, num_cols, policy_name, seeds, max_steps, wrap=False):
+    """Plays one episode for each seed, and returns a list of (seed, points, steps,
+    death cause) tuples where the death cause is "wall", "body", "max steps" or "won"
+    if the snake filled the grid"""
+    results = []
+    for seed in seeds:
+        model = SnakeModel(num_rows, num_cols, random.Random(seed), VirtualClock())
+        model.wrap_status = wrap
+        policy = POLICIES[policy_name](seed=seed)
+        steps = run_episode(model, policy, max_steps)
+        if model.state == "game won":
+            death_cause = "won"
+        else:
+            death_cause = model.death_cause or "max steps"
+        results.append((seed, model.points, steps, death_cause))
+    return results
+
+
+class TournamentResults:
+    """Aggregates per-episode results as they stream in from the workers"""
+
+    def __init__(self, writer=None):
+        """initialize empty totals, and write each episode to the csv writer if given"""
+        self.writer = writer
+        self.episodes = 0
+        self.points = 0
+        self.steps = 0
+        self.best = None
+        self.death_causes = {}
+
+    def add(self, results):
+        """adds a list of (seed, points, steps, death cause) episode results"""
+        for seed, points, steps, death_cause in results:
+            self.episodes += 1
+            self.points += points
+            self.steps += steps
+            self.death_causes[death_cause] = self.death_causes.get(death_cause, 0) + 1
+            if self.best is None or points > self.best[1]:
+                self.best = (seed, points)
+        if self.writer is not None:
+            self.writer.writerows(results)
+
+
+def run(
+    num_rows,
+    num_cols,
+    policy_name,
+    seeds,
+    max_steps,
+    wrap=False,
+    workers=None,
+    chunk_size=100,
+    writer=None,
+):
+    """Plays one episode per seed in a pool of worker processes, and returns the
+    TournamentResults and the elapsed seconds"""
+    seeds = list(seeds)
+    results = TournamentResults(writer)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                play_episodes,
+                num_rows,
+                num_cols,
+                policy_name,
+                seeds[i : i + chunk_size],
+                max_steps,
+                wrap,
+            )
+            for i in range(0, len(seeds), chunk_size)
+        ]
+        for future in as_completed(futures):
+            results.add(future.result())
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a policy on all cores")
+    parser.add_argument("--rows", type=int, default=30)
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=10000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--wrap", action="store_true", help="turn on wrap around mode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--csv", help="write one row per episode to this file")
+    args = parser.parse_args()
+    if args.episodes < 1:
+        parser.error("--episodes must be at least 1")
+
+    seeds = range(args.first_seed, args.first_seed + args.episodes)
+    csv_file = open(args.csv, "w", newline="") if args.csv else None
+    try:
+        writer = None
+        if csv_file is not None:
+            writer = csv.writer(csv_file)
+            writer.writerow(["seed", "points", "steps", "death_cause"])
+        results, seconds = run(
+            args.rows,
+            args.cols,
+            args.policy,
+            seeds,
+            args.max_steps,
+            args.wrap,
+            args.workers,
+            args.chunk_size,
+            writer,
+        )
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+
+    print(f"Workers: {args.workers}")
+    print(f"Episodes: {results.episodes}")
+    print(f"Mean points: {results.points / results.episodes:.2f}")
+    print(f"Best: seed {results.best[0]} with {results.best[1]} points")
+    print(f"Death causes: {results.death_causes}")
+    print(f"Seconds: {seconds:.2f}")
+    print(f"Episodes per sec: {results.episodes / seconds:.1f}")
+    print(f"Steps per sec: {results.steps / seconds:.0f}")
+
+
+class TournamentTest(unittest.TestCase):
+    def test_run_matches_play_episodes(self):
+        csv_file = io.StringIO()
+        results, seconds = run(
+            8,
+            8,
+            "random",
+            range(7),
+            200,
+            workers=1,
+            chunk_size=3,
+            writer=csv.writer(csv_file),
+        )
+        expected = play_episodes(8, 8, "random", range(7), 200)
+        rows = csv.reader(io.StringIO(csv_file.getvalue()))
+        self.assertEqual(
+            sorted(rows, key=lambda row: int(row[0])),
+            [[str(value) for value in episode] for episode in expected],
+        )
+        self.assertEqual(results.episodes, 7)
+        self.assertEqual(results.points, sum(episode[1] for episode in expected))
+        self.assertEqual(results.steps, sum(episode[2] for episode in expected))
+        death_causes = {}
+        for episode in expected:
+            death_causes[episode[3]] = death_causes.get(episode[3], 0) + 1
+        self.assertEqual(results.death_causes, death_causes)
+        self.assertEqual(results.best[1], max(episode[1] for episode in expected))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Module: snake_view_bench
+
+Author: Rodolfo Lopez and Justin de Sousa
+
+Description: Benchmarks window construction and redraw time of the snake views
+
+Compares SnakeView, which uses one frame widget per cell, CanvasSnakeView, which
+draws every cell on a single canvas, and PhotoSnakeView, which draws cells into
+image tiles. Each view is only timed on grids up to its MAX_CELLS, so that the
+default sizes reach a grid of over a million cells with the image tiles alone.
+Needs a display.
+"""
+
+import argparse
+import json
+import time
+import tkinter as tk
+
+from snake7 import CanvasSnakeView, PhotoSnakeView, SnakeView
+
+VIEWS = {"frame": SnakeView, "canvas": CanvasSnakeView, "photo": PhotoSnakeView}
+
+# Largest grid each view is timed on, beyond which building it takes minutes
+MAX_CELLS = {"frame": 100 * 100, "canvas": 300 * 300, "photo": None}
+
+
+def time_view(view_class, num_rows, num_cols, frames):
+    """Returns the construction time, full redraw time, dirty redraw time and corner
+    redraw time of a view in seconds, where the redraw times are per frame"""
+    start = time.perf_counter()
+    view = view_class(num_rows, num_cols)
+    view.window.update()
+    construction = time.perf_counter() - start
+
+    # Repaint every cell, as the controller used to on every step
+    colors = ("White", "Blue")
+    start = time.perf_counter()
+    for frame in range(frames):
+        color = colors[frame % 2]
+        for r in range(num_rows):
+            for c in range(num_cols):
+                view.set_cell_color(r, c, color)
+        view.window.update_idletasks()
+    full_redraw = (time.perf_counter() - start) / frames
+
+    # Repaint the few cells a step changes: old head, new head, tail and food, with
+    # the tail and food far from the head
+    start = time.perf_counter()
+    for frame in range(frames):
+        col = frame % num_cols
+        view.set_cell_color(0, col, "Blue")
+        view.set_cell_color(1, col, "Black")
+        view.set_cell_color(num_rows - 1, col, "White")
+        view.set_cell_color(num_rows // 2, num_cols - 1 - col, "Red")
+        view.window.update_idletasks()
+    dirty_redraw = (time.perf_counter() - start) / frames
+
+    # Repaint two cells at opposite corners of the first image tile, which should
+    # cost about as much as two cells side by side
+    corner = min(num_rows, num_cols, 64) - 1
+    colors = ("Red", "Green")
+    start = time.perf_counter()
+    for frame in range(frames):
+        color = colors[frame % 2]
+        view.set_cell_color(0, 0, color)
+        view.set_cell_color(corner, corner, color)
+        view.window.update_idletasks()
+    corner_redraw = (time.perf_counter() - start) / frames
+
+    view.window.destroy()
+    return construction, full_redraw, dirty_redraw, corner_redraw
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the snake views")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 30, 100, 300, 1000, 1200]
+    )
+    parser.add_argument(
+        "--views", choices=sorted(VIEWS), nargs="+", default=list(VIEWS)
+    )
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'view':>8} {'size':>9} {'build ms':>10} {'full ms':>10} {'dirty ms':>10}"
+        f" {'corner ms':>10}"
+    )
+    for size in args.sizes:
+        for name in args.views:
+            if MAX_CELLS[name] is not None and size * size > MAX_CELLS[name]:
+                continue
+            view_class = VIEWS[name]
+            try:
+                construction, full_redraw, dirty_redraw, corner_redraw = time_view(
+                    view_class, size, size, args.frames
+                )
+            except tk.TclError as error:
+                raise SystemExit(f"Cannot open a window: {error}")
+            results.append(
+                {
+                    "view": name,
+                    "num_rows": size,
+                    "num_cols": size,
+                    "construction_sec": construction,
+                    "full_redraw_sec": full_redraw,
+                    "dirty_redraw_sec": dirty_redraw,
+                    "corner_redraw_sec": corner_redraw,
+                }
+            )
+            print(
+                f"{name:>8} {size:>4}x{size:<4} {construction * 1000:>10.1f}"
+                f" {full_redraw * 1000:>10.2f} {dirty_redraw * 1000:>10.3f}"
+                f" {corner_redraw * 1000:>10.3f}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()